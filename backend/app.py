@@ -1,9 +1,10 @@
 # backend/app.py
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
 import sys
+import json
 import logging
 
 # 将 backend 目录添加到 Python 路径中，以便 PyCharm/本地调试可以找到相对导入
@@ -19,10 +20,14 @@ if os.path.basename(os.getcwd()) == 'backend':
         sys.path.insert(0, parent_dir)
 
 # 导入配置和核心模块 (使用绝对导入)
-from config.settings import INTENT_CONFIDENCE_THRESHOLD, IMAGE_STORAGE_PATH
-from workflow.intent_recognizer import IntentRecognizer
+from config.settings import INTENT_CONFIDENCE_THRESHOLD, IMAGE_STORAGE_PATH, TASK_CATALOG_REFRESH_INTERVAL
 from workflow.engine import WorkflowEngine
-from rag.handler import RAGHandler
+from runtime.registry import registry
+from runtime.health import health_monitor
+from runtime.models import model_residency
+from runtime.deadline import Deadline
+from llm.embedding_cache import get_embedding_cache
+from llm.generation_scheduler import generation_scheduler, GenerationRejected, PRIORITY_BATCH, PRIORITY_INTERACTIVE
 
 # --- Flask 应用初始化 ---
 app = Flask(__name__)
@@ -38,14 +43,13 @@ logger = logging.getLogger(__name__)
 # 在生产环境中使用 gunicorn 等 WSGI 服务器时，应该有更健壮的连接重试逻辑。
 
 # 全局变量用于存储模块实例
-intent_recognizer = None
+# IntentRecognizer / RAGHandler 由 runtime.registry 统一持有，所有请求线程共享同一实例
 workflow_engine = None
-rag_handler = None
 modules_initialized = False
 
 def initialize_modules():
     """初始化所有后端模块"""
-    global intent_recognizer, workflow_engine, rag_handler, modules_initialized
+    global workflow_engine, modules_initialized
     
     # 1. 尝试初始化数据库连接（可选）
     db_initialized = False
@@ -61,19 +65,27 @@ def initialize_modules():
     
     # 2. 初始化核心模块（即使数据库失败也要继续）
     try:
-        intent_recognizer = IntentRecognizer()
+        registry.reload_intent_recognizer(force=True)
         print("✓ IntentRecognizer 初始化成功")
         
         workflow_engine = WorkflowEngine()
         print("✓ WorkflowEngine 初始化成功")
         
-        # RAG Handler 可能需要向量数据库，如果失败就跳过
+        # RAG Handler 可能需要向量数据库，如果失败就跳过（请求时会再次尝试构建）
         try:
-            rag_handler = RAGHandler()
+            registry.get_rag_handler()
             print("✓ RAGHandler 初始化成功")
         except Exception as e:
             print(f"⚠️ RAGHandler 初始化失败: {e}")
-            rag_handler = None
+        
+        # 任务目录变化时自动替换 IntentRecognizer
+        registry.start_catalog_watcher(TASK_CATALOG_REFRESH_INTERVAL)
+        
+        # 后台检查 Weaviate / Ollama / PostgreSQL，请求路径只读取缓存的状态
+        health_monitor.start()
+        
+        # 后台预热生成模型与向量模型并保持常驻，避免首个请求等待模型加载
+        model_residency.start()
         
         modules_initialized = True
         print("✓ Backend modules initialized successfully.")
@@ -100,6 +112,10 @@ def health_check():
         "status": "ok",
         "message": "AI Assistant Backend is running",
         "modules_initialized": modules_initialized,
+        "embedding_cache": get_embedding_cache().stats(),
+        "services": health_monitor.snapshot(),
+        "models": model_residency.snapshot(),
+        "generation": generation_scheduler.stats(),
         "version": "1.0.0"
     })
 
@@ -113,10 +129,10 @@ def _is_greeting(text: str) -> bool:
 
 @app.route('/assistant', methods=['POST'])
 def assistant_interface():
-    global intent_recognizer, workflow_engine, rag_handler, modules_initialized
+    global workflow_engine, modules_initialized
     
     # 检查模块初始化状态
-    if not modules_initialized or intent_recognizer is None:
+    if not modules_initialized:
         # 尝试重新初始化
         if not initialize_modules():
             return jsonify({
@@ -139,10 +155,11 @@ def assistant_interface():
             "data": {"answer": "你好，有什么可以帮助你的吗？"}
         })
 
-    # 下面继续原有意图识别与路由
+    # 下面继续原有意图识别与路由（整个请求共用一个时间预算）
+    deadline = Deadline()
     try:
         # 1. 意图识别
-        result = intent_recognizer.recognize(user_input)
+        result = registry.get_intent_recognizer().recognize(user_input, deadline)
         task_id = result.get("recognized_task_id")
         confidence = result.get("confidence")
 
@@ -166,7 +183,8 @@ def assistant_interface():
             }
         else:  # 低置信度 (< 0.75)
             # 3. 执行知识问答模块 (RAG)
-            qa_data = rag_handler.answer_question(user_input)
+            qa_data = registry.get_rag_handler().answer_question(user_input, query_vector=result.get("query_vector"),
+                                                                 priority=_request_priority(data), deadline=deadline)
 
             response_data = {
                 "response_type": "open_qa",  # 场景二：RAG 问答
@@ -177,6 +195,8 @@ def assistant_interface():
 
         return jsonify(response_data)
 
+    except GenerationRejected as e:
+        return _busy_response(e)
     except ConnectionError as e:
         # 专门捕获 Ollama 或数据库连接失败导致的错误
         return jsonify({"error": f"Service connection error: {str(e)}"}), 503
@@ -209,10 +229,10 @@ def chat_interface():
                 'data': {'answer': '你好，有什么可以帮助你的吗？'}
             })
         
-        # 下面继续原有意图识别与RAG逻辑
-        from workflow.intent_recognizer import IntentRecognizer
-        recognizer = IntentRecognizer()
-        intent_result = recognizer.recognize_intent(user_input)
+        # 下面继续原有意图识别与RAG逻辑（使用进程级共享实例，避免每次请求重新加载任务目录）
+        deadline = Deadline()
+        recognizer = registry.get_intent_recognizer()
+        intent_result = recognizer.recognize_intent(user_input, deadline)
         task_id = intent_result.get('task_id')
         confidence = intent_result.get('confidence', 0.0)
         
@@ -237,96 +257,14 @@ def chat_interface():
                         }
                     })
                 
-                # 构建任务引导响应
-                task_name = task_data.get('name', '未知任务')
-                steps = task_data.get('steps', [])
-                
-                # 首先尝试从数据库获取详细步骤信息
-                detailed_steps = []
-                try:
-                    from db.sql_repo import get_task_details
-                    task_details = get_task_details(task_id)
-                    
-                    if task_details and 'steps' in task_details and task_details['steps']:
-                        # 使用数据库中的详细步骤信息
-                        db_steps = task_details['steps']
-                        print(f"从数据库获取到 {len(db_steps)} 个步骤")
-                        
-                        for i, db_step in enumerate(db_steps):
-                            step_info = {
-                                'step_number': db_step.get('step', i + 1),
-                                'step_name': db_step.get('step_name', f'步骤 {i + 1}'),
-                                'description': db_step.get('step_name', f'步骤 {i + 1}'),
-                                'element_id': db_step.get('element_id', ''),
-                                'action': db_step.get('action', 'click'),
-                                'image_path': None
-                            }
-                            
-                            # 构建图片路径
-                            element_id = db_step.get('element_id', '')
-                            if element_id:
-                                # 检查图片文件是否存在
-                                image_filename = f"{element_id}.png"
-                                image_path = f"/images/{image_filename}"
-                                step_info['image_path'] = image_path
-                                print(f"  步骤 {i+1}: {step_info['step_name']} -> 图片: {image_filename}")
-                            else:
-                                print(f"  步骤 {i+1}: {step_info['step_name']} -> 无图片")
-                            
-                            detailed_steps.append(step_info)
-                    else:
-                        # 如果数据库中没有详细步骤，使用意图识别器中的步骤
-                        print(f"数据库中无详细步骤，使用意图识别器中的 {len(steps)} 个步骤")
-                        for i, step in enumerate(steps):
-                            step_info = {
-                                'step_number': i + 1,
-                                'step_name': step if isinstance(step, str) else str(step),
-                                'description': step if isinstance(step, str) else str(step),
-                                'element_id': '',
-                                'action': 'click',
-                                'image_path': None
-                            }
-                            detailed_steps.append(step_info)
-                            
-                except Exception as e:
-                    print(f"获取步骤详情时出错: {e}")
-                    # 使用基本步骤信息作为备用
-                    for i, step in enumerate(steps):
-                        step_info = {
-                            'step_number': i + 1,
-                            'step_name': step if isinstance(step, str) else str(step),
-                            'description': step if isinstance(step, str) else str(step),
-                            'element_id': '',
-                            'action': 'click',
-                            'image_path': None
-                        }
-                        detailed_steps.append(step_info)
-                
-                # 生成富文本响应
-                if detailed_steps:
-                    steps_text = []
-                    for step_info in detailed_steps:
-                        step_desc = f"{step_info['step_number']}. {step_info.get('step_name', step_info['description'])}"
-                        if step_info.get('action') == 'click':
-                            step_desc += " (点击操作)"
-                        elif step_info.get('action') == 'input':
-                            step_desc += " (输入操作)"
-                        steps_text.append(step_desc)
-                    
-                    response_text = f"我来帮你完成「{task_name}」任务。\n\n操作步骤：\n" + "\n".join(steps_text)
-                else:
-                    response_text = f"我找到了「{task_name}」任务，但暂时没有详细步骤信息。"
+                # 构建任务引导响应（数据库详细步骤优先）
+                guidance = (workflow_engine or WorkflowEngine()).build_task_guidance(task_id, task_data)
                 
                 return jsonify({
                     'response_type': 'task_execution',
                     'recognized_task_id': task_id,
                     'confidence': confidence,
-                    'data': {
-                        'task_name': task_name,
-                        'description': task_data.get('description', ''),
-                        'steps': detailed_steps,
-                        'response_text': response_text
-                    }
+                    'data': guidance
                 })
                 
             except Exception as e:
@@ -342,9 +280,10 @@ def chat_interface():
         else:
             # 低置信度：使用RAG问答
             try:
-                from rag.handler import RAGHandler
-                rag_handler = RAGHandler()
-                rag_result = rag_handler.answer_question(user_input)
+                rag_result = registry.get_rag_handler().answer_question(
+                    user_input, query_vector=intent_result.get('query_vector'),
+                    priority=_request_priority(data), deadline=deadline
+                )
                 
                 answer = rag_result.get('answer', '抱歉，我无法找到相关信息。')
                 sources = rag_result.get('sources', [])
@@ -355,10 +294,14 @@ def chat_interface():
                     'confidence': confidence,
                     'data': {
                         'answer': answer,
-                        'sources': sources
+                        'sources': sources,
+                        'mode': rag_result.get('mode', 'generative'),
+                        'degraded': bool(rag_result.get('degraded'))
                     }
                 })
                 
+            except GenerationRejected as e:
+                return _busy_response(e)
             except Exception as e:
                 print(f"RAG processing error: {e}")
                 return jsonify({
@@ -375,6 +318,100 @@ def chat_interface():
         return jsonify({'error': str(e)}), 500
 
 
+def _request_priority(data: dict) -> int:
+    """请求体 priority 为 "batch" 时（批量导入、评测脚本）按低优先级调度生成，其余均为交互式"""
+    return PRIORITY_BATCH if (data or {}).get('priority') == 'batch' else PRIORITY_INTERACTIVE
+
+
+def _busy_response(e: GenerationRejected):
+    """生成调度拒绝：返回 429/503 并附带 Retry-After，客户端据此稍后重试"""
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def _sse(event: str, data: dict) -> str:
+    """编码一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream_interface():
+    """
+    流式聊天接口（Server-Sent Events），路由逻辑与 /chat 相同。事件顺序：
+    - route：路由结果 {response_type, recognized_task_id, confidence}
+    - task：任务引导数据（仅 task_execution）
+    - sources：检索到的来源（仅 open_qa，检索完成后立即发出，早于排队等待生成槽位）
+    - token：逐段生成的答案文本 {text}
+    - done：完整结果；出错时为 error 事件（生成队列已满时含 status 与 retry_after）
+    """
+    global workflow_engine, modules_initialized
+
+    # 检查模块初始化状态：须在开始 SSE 响应之前，之后就无法再返回 503
+    if not modules_initialized:
+        if not initialize_modules():
+            return jsonify({
+                "error": "Backend modules failed to initialize. Please check database and service connections.",
+                "details": "PostgreSQL, Ollama, or Weaviate services may be unavailable."
+            }), 503
+
+    data = request.get_json(silent=True) or {}
+    user_input = (data.get('user_input') or '').strip()
+    if not user_input:
+        return jsonify({'error': 'Missing user_input'}), 400
+
+    def generate():
+        try:
+            if _is_greeting(user_input):
+                answer = '你好，有什么可以帮助你的吗？'
+                yield _sse('route', {'response_type': 'open_qa', 'recognized_task_id': None, 'confidence': 1.0})
+                yield _sse('token', {'text': answer})
+                yield _sse('done', {'answer': answer, 'sources': []})
+                return
+
+            deadline = Deadline()
+            recognizer = registry.get_intent_recognizer()
+            intent_result = recognizer.recognize_intent(user_input, deadline)
+            task_id = intent_result.get('task_id')
+            confidence = intent_result.get('confidence', 0.0)
+            task_data = recognizer.task_data.get(task_id, {}) if task_id else {}
+
+            # 与 /chat 相同的阈值
+            if confidence >= 0.5 and task_data:
+                yield _sse('route', {'response_type': 'task_execution', 'recognized_task_id': task_id,
+                                     'confidence': confidence})
+                guidance = (workflow_engine or WorkflowEngine()).build_task_guidance(task_id, task_data)
+                yield _sse('task', guidance)
+                yield _sse('done', {'answer': guidance.get('response_text', ''), 'sources': []})
+                return
+
+            yield _sse('route', {'response_type': 'open_qa', 'recognized_task_id': task_id,
+                                 'confidence': confidence})
+            events = registry.get_rag_handler().stream_answer(
+                user_input, query_vector=intent_result.get('query_vector'), priority=_request_priority(data),
+                deadline=deadline
+            )
+            for event, payload in events:
+                yield _sse(event, payload)
+        except GenerationRejected as e:
+            # 响应已开始，无法再改状态码：以 error 事件告知状态码与建议的重试时间
+            yield _sse('error', {'error': str(e), 'status': e.status, 'retry_after': e.retry_after})
+        except Exception as e:
+            logger.error(f"[CHAT_STREAM] 流式处理出错: {e}")
+            yield _sse('error', {'error': str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # 关闭 nginx 代理缓冲，保证逐段送达浏览器
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
 # --- 5.2.2. 获取任务列表接口: /tasks ---
 @app.route('/tasks', methods=['GET'])
 def get_tasks():
@@ -406,6 +443,26 @@ def get_tasks():
         }), 500
 
 
+# --- 任务目录热加载接口: /tasks/reload ---
+@app.route('/tasks/reload', methods=['POST'])
+def reload_tasks():
+    """
+    重新加载任务目录并原子替换共享的 IntentRecognizer。
+    默认仅在目录有变化时重建；传入 {"force": true} 可强制重建。
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = registry.reload_intent_recognizer(force=bool(data.get('force', False)))
+        return jsonify({
+            "success": True,
+            "reloaded": result["reloaded"],
+            "task_count": result["task_count"]
+        })
+    except Exception as e:
+        logger.error(f"Error reloading task catalog: {e}")
+        return jsonify({"error": f"Failed to reload tasks: {str(e)}"}), 500
+
+
 # --- 5.2.3. 任务截图服务接口: /tasks/screenshots/<filename> ---
 @app.route('/tasks/screenshots/<path:filename>', methods=['GET'])
 def get_screenshot(filename):
@@ -0,0 +1,191 @@
+# backend/async_app.py
+"""
+异步入口（Quart / ASGI）
+
+与 app.py 提供相同的 / 与 /chat 接口，但 RAG 的向量化、检索与生成均以 await 方式调用：
+等待 Ollama 生成的几十秒里不占用工作线程，单个进程即可同时挂起大量请求。
+其余接口（/tasks、图片等）仍由 app.py 提供。
+
+运行：
+    hypercorn async_app:app --bind 0.0.0.0:8001
+"""
+import asyncio
+import logging
+import os
+import sys
+
+from quart import Quart, request, jsonify
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from config.settings import INTENT_SEMANTIC_ENABLED, TASK_CATALOG_REFRESH_INTERVAL
+from workflow.engine import WorkflowEngine
+from runtime.registry import registry
+from runtime.health import health_monitor
+from runtime.models import model_residency
+from runtime.deadline import Deadline
+from runtime.http import close_async_clients
+from llm.embedding_cache import get_embedding_cache
+from llm.generation_scheduler import generation_scheduler, GenerationRejected, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+app = Quart(__name__)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 与 app.py /chat 保持一致
+CHAT_CONFIDENCE_THRESHOLD = 0.5
+
+workflow_engine = WorkflowEngine()
+modules_initialized = False
+
+
+@app.before_serving
+async def startup():
+    """启动时在线程中完成阻塞的初始化（数据库、任务目录、RAG 处理器）"""
+    global modules_initialized
+
+    def _init():
+        try:
+            from db.sql_repo import initialize_db
+            if not initialize_db():
+                logger.warning("[ASYNC_APP] PostgreSQL 数据库连接失败，继续初始化其他模块")
+        except Exception as e:
+            logger.warning(f"[ASYNC_APP] 数据库初始化失败: {e}")
+        registry.reload_intent_recognizer(force=True)
+        try:
+            registry.get_rag_handler()
+        except Exception as e:
+            logger.warning(f"[ASYNC_APP] RAGHandler 初始化失败: {e}")
+        registry.start_catalog_watcher(TASK_CATALOG_REFRESH_INTERVAL)
+        health_monitor.start()
+        model_residency.start()
+
+    try:
+        await asyncio.to_thread(_init)
+        modules_initialized = True
+        logger.info("[ASYNC_APP] Backend modules initialized successfully.")
+    except Exception as e:
+        logger.error(f"[ASYNC_APP] 初始化失败: {e}")
+
+
+@app.after_serving
+async def shutdown():
+    registry.stop()
+    health_monitor.stop()
+    model_residency.stop()
+    await close_async_clients()
+
+
+def _is_greeting(text: str) -> bool:
+    text = (text or "").strip().lower()
+    greetings = ["你好", "您好", "hi", "hello", "hey", "嗨", "在吗"]
+    return any(g in text for g in greetings)
+
+
+@app.route('/', methods=['GET'])
+async def health_check():
+    return jsonify({
+        "status": "ok",
+        "message": "AI Assistant Backend (async) is running",
+        "modules_initialized": modules_initialized,
+        "embedding_cache": get_embedding_cache().stats(),
+        "services": health_monitor.snapshot(),
+        "models": model_residency.snapshot(),
+        "generation": generation_scheduler.stats(),
+        "version": "1.0.0"
+    })
+
+
+@app.route('/chat', methods=['POST'])
+async def chat_interface():
+    """聊天接口 - 与 app.py 相同的路由逻辑，RAG 部分异步执行"""
+    try:
+        data = await request.get_json()
+        user_input = ((data or {}).get('user_input') or '').strip()
+        if not user_input:
+            return jsonify({'error': 'Missing user_input'}), 400
+
+        if _is_greeting(user_input):
+            return jsonify({
+                'response_type': 'open_qa',
+                'recognized_task_id': None,
+                'confidence': 1.0,
+                'data': {'answer': '你好，有什么可以帮助你的吗？'}
+            })
+
+        deadline = Deadline()
+        recognizer = registry.get_intent_recognizer()
+        if INTENT_SEMANTIC_ENABLED:
+            # 语义匹配会同步调用 Embedding 接口，放到线程中避免阻塞事件循环
+            intent_result = await asyncio.to_thread(recognizer.recognize_intent, user_input, deadline)
+        else:
+            intent_result = recognizer.recognize_intent(user_input, deadline)
+        task_id = intent_result.get('task_id')
+        confidence = intent_result.get('confidence', 0.0)
+        logger.info(f"[ASYNC_APP] Intent recognition - Task ID: {task_id}, Confidence: {confidence}")
+
+        if confidence >= CHAT_CONFIDENCE_THRESHOLD and task_id:
+            task_data = recognizer.task_data.get(task_id, {})
+            if not task_data:
+                return jsonify({
+                    'response_type': 'open_qa',
+                    'recognized_task_id': task_id,
+                    'confidence': confidence,
+                    'data': {'answer': f'抱歉，找不到任务ID为 {task_id} 的相关信息。'}
+                })
+            try:
+                guidance = await asyncio.to_thread(workflow_engine.build_task_guidance, task_id, task_data)
+            except Exception as e:
+                logger.error(f"[ASYNC_APP] Error getting task data: {e}")
+                return jsonify({
+                    'response_type': 'open_qa',
+                    'recognized_task_id': task_id,
+                    'confidence': confidence,
+                    'data': {'answer': f'找到了相关任务（置信度: {confidence:.2f}），但获取详细信息时出现错误。'}
+                })
+            return jsonify({
+                'response_type': 'task_execution',
+                'recognized_task_id': task_id,
+                'confidence': confidence,
+                'data': guidance
+            })
+
+        try:
+            priority = PRIORITY_BATCH if (data or {}).get('priority') == 'batch' else PRIORITY_INTERACTIVE
+            rag_result = await registry.get_rag_handler().answer_question_async(
+                user_input, query_vector=intent_result.get('query_vector'), priority=priority, deadline=deadline
+            )
+        except GenerationRejected as e:
+            return jsonify({'error': str(e), 'retry_after': e.retry_after}), e.status, {'Retry-After': str(e.retry_after)}
+        except Exception as e:
+            logger.error(f"[ASYNC_APP] RAG processing error: {e}")
+            return jsonify({
+                'response_type': 'open_qa',
+                'recognized_task_id': task_id,
+                'confidence': confidence,
+                'data': {
+                    'answer': f'抱歉，我对你的请求理解不够清楚（置信度: {confidence:.2f}）。请尝试更具体地描述你想要完成的任务，或者检查AI服务是否正常运行。'
+                }
+            })
+        return jsonify({
+            'response_type': 'open_qa',
+            'recognized_task_id': task_id,
+            'confidence': confidence,
+            'data': {
+                'answer': rag_result.get('answer', '抱歉，我无法找到相关信息。'),
+                'sources': rag_result.get('sources', []),
+                'mode': rag_result.get('mode', 'generative'),
+                'degraded': bool(rag_result.get('degraded'))
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"[ASYNC_APP] Chat endpoint error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=8001)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prefill 基准脚本 - benchmark_prefill.py
+对比两种 Prompt 组织方式下 Ollama 的 prefill（prompt eval）耗时：
+- 旧版：固定规则与上下文拼成一个字符串，调用 /api/generate
+- 新版：固定规则作为 system 消息（RAG_SYSTEM_PROMPT），上下文与问题作为 user 消息，调用 /api/chat 并设置 keep_alive
+耗时取自 Ollama 响应中的 prompt_eval_count / prompt_eval_duration / load_duration。
+只生成 1 个 token，结果只反映 prefill。
+
+用法：
+    python benchmark_prefill.py [问题1 问题2 ...]
+"""
+
+import os
+import sys
+import statistics
+
+# 添加当前目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from config.settings import OLLAMA_API_URL, LLM_MODEL_NAME, OLLAMA_KEEP_ALIVE, RETRIEVAL_TOP_K, OLLAMA_GENERATE_TIMEOUT
+from db.vector_repo import retrieve_hits
+from rag.context_budget import ContextBudgeter, format_context
+from rag.handler import RAGHandler, RAG_SYSTEM_PROMPT
+from runtime.http import get_session
+
+DEFAULT_QUESTIONS = [
+    "软件安装对电脑配置有要求吗？",
+    "如何解决仪器无法通讯的问题？",
+    "1/4桥应该怎么接线？",
+    "抗混滤波的截止频率怎么设置？",
+    "采样频率设置多少比较合适？",
+]
+
+# 调整前 _build_prompt 生成的完整 Prompt（规则与上下文交织在同一个字符串中）
+LEGACY_TEMPLATE = """
+你是一个专业的 AI 助手。请遵守以下规则：
+- 如果用户只是打招呼或寒暄（如“你好”、“您好”、“hi”），只回复“你好，有什么可以帮助你的吗？”
+- 不要复述历史；避免引用会话记忆。
+- 仅在用户提出明确问题或任务时，基于上下文提供答案。
+
+【上下文信息】:
+{context_str}
+
+【用户问题】:
+{user_input}
+
+【你的回答】:
+"""
+
+OPTIONS = {"num_predict": 1}
+
+
+def build_contexts(question):
+    hits = ContextBudgeter().select(retrieve_hits(question, RETRIEVAL_TOP_K, question))
+    return [format_context(h) for h in hits]
+
+
+def run_legacy(session, question, contexts):
+    prompt = LEGACY_TEMPLATE.format(context_str="\n\n".join(contexts), user_input=question).strip()
+    payload = {"model": LLM_MODEL_NAME, "prompt": prompt, "stream": False, "options": OPTIONS}
+    r = session.post(f"{OLLAMA_API_URL}/api/generate", json=payload, timeout=OLLAMA_GENERATE_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+
+def run_chat(session, handler, question, contexts):
+    payload = {
+        "model": LLM_MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": RAG_SYSTEM_PROMPT},
+            {"role": "user", "content": handler._build_prompt(question, contexts)},
+        ],
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": OPTIONS,
+    }
+    r = session.post(f"{OLLAMA_API_URL}/api/chat", json=payload, timeout=OLLAMA_GENERATE_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+
+def summarize(name, results):
+    prefill_ms = [r.get("prompt_eval_duration", 0) / 1e6 for r in results]
+    tokens = [r.get("prompt_eval_count", 0) for r in results]
+    load_ms = [r.get("load_duration", 0) / 1e6 for r in results]
+    print(f"{name}:")
+    print(f"  prefill 耗时  中位数 {statistics.median(prefill_ms):8.1f} ms  平均 {statistics.mean(prefill_ms):8.1f} ms")
+    print(f"  prefill token 中位数 {statistics.median(tokens):8.0f}     平均 {statistics.mean(tokens):8.1f}")
+    print(f"  模型加载耗时  中位数 {statistics.median(load_ms):8.1f} ms")
+
+
+def main():
+    questions = sys.argv[1:] or DEFAULT_QUESTIONS
+    session = get_session("ollama")
+    handler = RAGHandler()
+
+    print(f"模型: {LLM_MODEL_NAME}  Ollama: {OLLAMA_API_URL}  问题数: {len(questions)}")
+    cases = []
+    for q in questions:
+        contexts = build_contexts(q)
+        print(f"  {q}  ->  {len(contexts)} 条上下文")
+        cases.append((q, contexts))
+
+    try:
+        # 各自先预热一次（加载模型），再依次跑全部问题
+        run_legacy(session, *cases[0])
+        legacy = [run_legacy(session, q, ctx) for q, ctx in cases]
+        run_chat(session, handler, *cases[0])
+        chat = [run_chat(session, handler, q, ctx) for q, ctx in cases]
+    except Exception as e:
+        print(f"调用 Ollama 失败: {e}")
+        return 1
+
+    print("=" * 60)
+    summarize("旧版 /api/generate（规则与上下文拼接）", legacy)
+    summarize("新版 /api/chat（固定 system 前缀 + keep_alive）", chat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
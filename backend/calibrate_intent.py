@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+意图置信度校准脚本 - calibrate_intent.py
+拟合 workflow/scoring.py 中 calibrate_confidence 的逻辑回归系数（_CALIBRATION_BIAS / STRENGTH / MARGIN）。
+
+样本（data/intent_calibration.jsonl，每行 {"query", "task_id", "source"}）：
+- task_rephrase：任务名称的改写问法（动词换成近义词、动宾倒装、套上“怎么/如何/我想”等问句），
+  只保留名称直接匹配不到、必须靠 BM25 打分的问法；BM25 最佳任务正是该任务时记为正例，否则为负例
+- knowledge_base：知识库中的全部问题（knowledge/knowledge_base.jsonl），一律为负例，应走 RAG 问答
+特征与 calibrate_confidence 中一致：strength = s1 / upper，margin = (s1 - s2) / upper。
+三组样本（改写问法正例、改写问法负例、知识库问题）各自的总权重相同，知识库问题不会因数量较少而被忽视。
+
+用法：
+    python calibrate_intent.py               # 读取已有样本文件（不存在时生成）并拟合
+    python calibrate_intent.py --regenerate  # 按当前任务目录与知识库重新生成样本后拟合
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+import logging
+
+import numpy as np
+
+# 添加当前目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# 只需关键词与 BM25 部分，不调用 Embedding 接口
+os.environ["INTENT_SEMANTIC_ENABLED"] = "false"
+
+from config.settings import INTENT_CONFIDENCE_THRESHOLD
+from workflow.intent_recognizer import IntentRecognizer, _clean_text
+
+SAMPLES_PATH = os.path.join(current_dir, "data", "intent_calibration.jsonl")
+KNOWLEDGE_PATH = os.path.join(os.path.dirname(current_dir), "knowledge", "knowledge_base.jsonl")
+
+# 任务名称开头的动词 -> 用户常用的其他说法
+VERB_SYNONYMS = {
+    "导入": ["导进", "载入"],
+    "导出": ["导出来", "输出成文件"],
+    "新建": ["创建", "新增"],
+    "删除": ["移除", "删掉"],
+    "添加": ["增加", "加入"],
+    "查看": ["打开", "看一下"],
+    "设置": ["设定", "配置"],
+    "复制": ["拷贝"],
+    "粘贴": ["贴上"],
+    "剪切": ["剪下"],
+    "打开": ["开启"],
+    "修改": ["更改", "调整"],
+    "改变": ["调整", "修改"],
+    "选择": ["选取", "挑选"],
+    "使用": ["用"],
+    "进行": ["做"],
+    "重命名": ["改名", "重新命名"],
+    "打印": ["打出"],
+    "输出": ["导出"],
+    "拉伸": ["拉长"],
+    "旋转": ["转动"],
+    "分割": ["切分"],
+    "清空": ["清除"],
+    "激活": ["启动"],
+    "启用": ["开启"],
+}
+
+QUESTION_TEMPLATES = ["怎么{verb}{obj}？", "如何{verb}{obj}", "我想{verb}{obj}", "{obj}怎么{verb}", "{verb}{obj}的步骤是什么"]
+# 名称开头不是动词时（如“数据回放”“模态验证”）：前后两半倒装后再套问句
+NOUN_TEMPLATES = ["{swapped}怎么操作？", "如何{swapped}", "软件里{swapped}在哪里"]
+
+# 逻辑回归的 L2 正则系数
+L2 = 0.01
+
+
+def load_recognizer() -> IntentRecognizer:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return IntentRecognizer()
+
+
+def rephrase(name: str):
+    """任务名称的改写问法"""
+    for verb, synonyms in VERB_SYNONYMS.items():
+        if name.startswith(verb) and len(name) > len(verb):
+            obj = name[len(verb):]
+            return [t.format(verb=s, obj=obj) for s in synonyms for t in QUESTION_TEMPLATES]
+    if len(name) >= 4:
+        half = len(name) // 2
+        swapped = name[half:] + name[:half]
+        return [t.format(swapped=swapped) for t in NOUN_TEMPLATES]
+    return []
+
+
+def knowledge_questions():
+    questions = []
+    with open(KNOWLEDGE_PATH, encoding="utf-8") as f:
+        for line in f:
+            content = json.loads(line).get("content") or ""
+            if content.startswith("问："):
+                questions.append(content.split("\n")[0][2:].strip())
+    return questions
+
+
+def generate_samples(recognizer: IntentRecognizer):
+    samples = []
+    for task_id in recognizer._task_order:
+        for query in rephrase(recognizer.task_data[task_id]["name"]):
+            # 名称直接匹配能命中的问法不经过打分，不参与拟合
+            if recognizer._match_direct(_clean_text(query)) is None:
+                samples.append({"query": query, "task_id": task_id, "source": "task_rephrase"})
+    for query in knowledge_questions():
+        samples.append({"query": query, "task_id": None, "source": "knowledge_base"})
+    with open(SAMPLES_PATH, "w", encoding="utf-8") as f:
+        for sample in samples:
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    print(f"已生成 {len(samples)} 条样本: {SAMPLES_PATH}")
+    return samples
+
+
+def load_samples():
+    with open(SAMPLES_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def features(recognizer: IntentRecognizer, samples):
+    """
+    返回 (特征矩阵 [strength, margin], 标签, 分组)；BM25 没有任何命中的样本置信度恒为 0，不参与拟合。
+    分组：0 = 知识库问题，1 = 改写问法正例，2 = 改写问法负例（最佳任务不对）
+    """
+    rows, labels, groups = [], [], []
+    for sample in samples:
+        top, upper = recognizer._bm25.top(sample["query"], 2)
+        if not top or upper <= 0:
+            continue
+        s1 = top[0][1]
+        s2 = top[1][1] if len(top) > 1 else 0.0
+        rows.append([min(1.0, s1 / upper), (s1 - s2) / upper])
+        predicted = recognizer._task_order[top[0][0]]
+        if sample["task_id"] is None:
+            labels.append(0.0)
+            groups.append(0)
+        elif predicted == sample["task_id"]:
+            labels.append(1.0)
+            groups.append(1)
+        else:
+            labels.append(0.0)
+            groups.append(2)
+    return np.asarray(rows), np.asarray(labels), np.asarray(groups)
+
+
+def fit_logistic(x: np.ndarray, y: np.ndarray, weights: np.ndarray, iterations: int = 100):
+    """牛顿法拟合带样本权重与 L2 正则（截距不参与正则）的逻辑回归，返回 [bias, strength, margin]"""
+    design = np.hstack([np.ones((len(x), 1)), x])
+    w = np.zeros(design.shape[1])
+    penalty = L2 * np.diag([0.0] + [1.0] * x.shape[1])
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-design @ w))
+        gradient = design.T @ (weights * (p - y)) + penalty @ w
+        hessian = design.T @ (design * (weights * p * (1 - p))[:, None]) + penalty
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    return w
+
+
+def main():
+    recognizer = load_recognizer()
+    if "--regenerate" in sys.argv or not os.path.exists(SAMPLES_PATH):
+        samples = generate_samples(recognizer)
+    else:
+        samples = load_samples()
+
+    x, y, groups = features(recognizer, samples)
+    counts = np.bincount(groups, minlength=3)
+    weights = len(y) / (len(counts) * counts[groups])
+    bias, strength, margin = fit_logistic(x, y, weights)
+    print(f"样本 {len(samples)} 条，参与拟合 {len(y)} 条（知识库问题 {counts[0]}，改写问法正例 {counts[1]}、负例 {counts[2]}）")
+    print("拟合系数（写入 workflow/scoring.py）:")
+    print(f"_CALIBRATION_BIAS = {bias:.1f}")
+    print(f"_CALIBRATION_STRENGTH = {strength:.1f}")
+    print(f"_CALIBRATION_MARGIN = {margin:.1f}")
+
+    # 按 /chat 的阈值 0.5 与 /assistant 使用的 INTENT_CONFIDENCE_THRESHOLD 统计各组样本被路由到任务的条数
+    p = 1.0 / (1.0 + np.exp(-(bias + strength * x[:, 0] + margin * x[:, 1])))
+    for threshold in (0.5, INTENT_CONFIDENCE_THRESHOLD):
+        routed = p >= threshold
+        print(f"阈值 {threshold}: 改写问法正例识别 {int((routed & (groups == 1)).sum())}/{counts[1]}，"
+              f"改写问法识别错任务 {int((routed & (groups == 2)).sum())}/{counts[2]}，"
+              f"知识库问题路由到任务 {int((routed & (groups == 0)).sum())}/{counts[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    sys.exit(main())
@@ -9,6 +9,12 @@ LLM_STRATEGY = os.getenv("LLM_STRATEGY", "local")  # "local" 或 "api"
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "qwen2.5:3b-instruct")           # 用于生成回答
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "bge-m3") # 用于向量化
+# 模型在 Ollama 中的驻留时间（如 "30m"、"-1" 表示常驻）：模型不被卸载，固定的系统提示词前缀的 KV 缓存才能跨请求复用
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# 生成调用准入控制：并发上限应与 Ollama 的 OLLAMA_NUM_PARALLEL 一致，超出的请求在有界队列中按优先级等待
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "1")))
+GENERATION_QUEUE_SIZE = int(os.getenv("GENERATION_QUEUE_SIZE", "8"))             # 等待队列长度上限，满了直接返回 429
+GENERATION_QUEUE_TIMEOUT = float(os.getenv("GENERATION_QUEUE_TIMEOUT", "30"))    # 排队等待上限（秒），超时返回 503
 
 # --- API策略配置 ---
 API_KEY = os.getenv("API_KEY", "")  # OpenAI/Claude等API密钥
@@ -30,4 +36,97 @@ WEAVIATE_AUTO_VECTORIZE = os.getenv("WEAVIATE_AUTO_VECTORIZE", "false").lower()
 
 # --- 业务逻辑配置 ---
 INTENT_CONFIDENCE_THRESHOLD = 0.65
-IMAGE_STORAGE_PATH = os.getenv("IMAGE_STORAGE_PATH", "/app/data/images")
\ No newline at end of file
+IMAGE_STORAGE_PATH = os.getenv("IMAGE_STORAGE_PATH", "/app/data/images")
+# --- 共享模块配置 ---
+# 后台检查任务目录变化的间隔（秒），<= 0 表示只允许通过 /tasks/reload 手动刷新
+TASK_CATALOG_REFRESH_INTERVAL = float(os.getenv("TASK_CATALOG_REFRESH_INTERVAL", "60"))
+
+# --- 语义意图识别配置 ---
+# 开启后，关键词未命中时用 bge-m3 向量与任务向量矩阵做相似度匹配
+INTENT_SEMANTIC_ENABLED = os.getenv("INTENT_SEMANTIC_ENABLED", "false").lower() == "true"
+INTENT_SEMANTIC_THRESHOLD = float(os.getenv("INTENT_SEMANTIC_THRESHOLD", "0.65"))  # 余弦相似度下限
+INTENT_SEMANTIC_TOP_K = int(os.getenv("INTENT_SEMANTIC_TOP_K", "3"))
+# 任务向量持久化文件，任务文本未变化时直接复用，避免每次启动重新向量化
+INTENT_EMBEDDINGS_PATH = os.getenv(
+    "INTENT_EMBEDDINGS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "task_embeddings.emb")
+)
+
+# --- Embedding 缓存配置 ---
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))            # 内存 LRU 条数，0 表示关闭
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))           # 过期时间（秒），<= 0 表示不过期
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "")                         # SQLite 持久化文件路径，留空则不启用
+
+# --- 批量向量化配置（/api/embed 多输入接口）---
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))               # 每次请求最多的文本条数
+EMBEDDING_BATCH_MAX_CHARS = int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "16000"))  # 每次请求的文本总字符数上限
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))              # 导入时并发请求数
+EMBEDDING_RATE_LIMIT = float(os.getenv("EMBEDDING_RATE_LIMIT", "0"))              # 每秒最多请求数，0 表示不限速
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))              # 单条失败后的重试次数
+
+# --- 语义答案缓存配置 ---
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))                  # 最多缓存的问答条数，0 表示关闭
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))                 # 过期时间（秒），<= 0 表示不过期
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))     # 查询向量余弦相似度下限；没有查询向量（自动向量化模式）时按规范化问题文本精确匹配
+RAG_SINGLE_FLIGHT = os.getenv("RAG_SINGLE_FLIGHT", "true").lower() == "true"      # 合并相同问题的并发请求，只调用一次 LLM
+
+# --- 上下文预算配置（检索结果拼入 Prompt 前的筛选） ---
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))                          # 每次检索的候选条数
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))             # 上下文估算 token 上限，<= 0 表示不限制
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.8"))    # 字符二元组 Jaccard 达到该值视为重复
+CONTEXT_SCORE_GAP = float(os.getenv("CONTEXT_SCORE_GAP", "0.5"))                  # 相邻得分落差超过最高分的该比例即截断，<= 0 关闭
+# 抽取式直答：用户问题与某条知识的问题足够接近且明显优于其他候选时，直接返回该条答案，不调用 LLM
+EXTRACTIVE_ANSWER_ENABLED = os.getenv("EXTRACTIVE_ANSWER_ENABLED", "true").lower() == "true"
+EXTRACTIVE_THRESHOLD = float(os.getenv("EXTRACTIVE_THRESHOLD", "0.8"))            # 问题相似度（字符二元组 Dice 系数）下限
+EXTRACTIVE_MARGIN = float(os.getenv("EXTRACTIVE_MARGIN", "0.15"))                 # 最佳候选须领先答案不同的次佳候选的相似度差
+# 知识库版本标记文件：导入脚本写入知识后更新它，运行中的后端据此让缓存失效
+# 与本地检索索引一样放在后端数据目录（而不是 /tmp），导入脚本与后端不共用临时目录时也能看到同一个文件
+KNOWLEDGE_VERSION_FILE = os.getenv(
+    "KNOWLEDGE_VERSION_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "knowledge.version")
+)
+# 知识库记录数缓存有效期（秒）：过期后先返回旧值并在后台刷新
+KNOWLEDGE_COUNT_TTL = float(os.getenv("KNOWLEDGE_COUNT_TTL", "300"))
+
+# --- HTTP 连接池与超时配置 ---
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))      # 每个 Session 缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))            # 每个主机保持的最大 keep-alive 连接数
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "false").lower() == "true"  # 连接用尽时阻塞等待而不是新建临时连接
+# 超时（秒）：连接超时统一配置，读超时按接口区分
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "3"))
+OLLAMA_EMBED_TIMEOUT = float(os.getenv("OLLAMA_EMBED_TIMEOUT", "60"))
+OLLAMA_GENERATE_TIMEOUT = float(os.getenv("OLLAMA_GENERATE_TIMEOUT", "120"))
+WEAVIATE_CONNECT_TIMEOUT = float(os.getenv("WEAVIATE_CONNECT_TIMEOUT", "3"))
+WEAVIATE_READY_TIMEOUT = float(os.getenv("WEAVIATE_READY_TIMEOUT", "5"))
+WEAVIATE_SCHEMA_TIMEOUT = float(os.getenv("WEAVIATE_SCHEMA_TIMEOUT", "15"))
+WEAVIATE_QUERY_TIMEOUT = float(os.getenv("WEAVIATE_QUERY_TIMEOUT", "15"))
+WEAVIATE_BATCH_TIMEOUT = float(os.getenv("WEAVIATE_BATCH_TIMEOUT", "30"))
+# Weaviate 地址熔断：连续失败次数达到阈值后跳过该地址，冷却（秒）后放行一个探测请求
+WEAVIATE_FAILURE_THRESHOLD = int(os.getenv("WEAVIATE_FAILURE_THRESHOLD", "3"))
+WEAVIATE_CIRCUIT_RESET = float(os.getenv("WEAVIATE_CIRCUIT_RESET", "30"))
+
+# --- 检索引擎配置 ---
+# weaviate：只用 Weaviate；local：只用进程内索引；auto：Weaviate 不可用时自动改用进程内索引
+RETRIEVAL_ENGINE = os.getenv("RETRIEVAL_ENGINE", "weaviate").lower()
+# 进程内检索索引文件，由 ingest_data.py 在导入知识库时生成
+LOCAL_INDEX_PATH = os.getenv(
+    "LOCAL_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "knowledge_index.emb")
+)
+# 混合检索：一次请求同时取 BM25 与向量两路排名，按倒数排名融合（关闭时只做单路 nearVector / bm25 检索）
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))   # 向量排名的权重：0 = 只看 BM25，1 = 只看向量
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))      # 倒数排名融合的平滑常数（与 Weaviate rankedFusion 相同）
+
+# --- 后台健康检查配置 ---
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))   # 检查间隔（秒），<= 0 表示不启动后台检查
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "3"))      # 单次探测的超时（秒）
+
+# --- 模型预热与驻留配置 ---
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"   # 启动时预加载生成模型与向量模型
+MODEL_RESIDENCY_INTERVAL = float(os.getenv("MODEL_RESIDENCY_INTERVAL", "60"))        # 驻留检查间隔（秒），<= 0 表示只在启动时预热一次
+
+# --- 请求级时间预算 ---
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "60"))                  # 单次问答的总时间预算（秒），<= 0 表示不限制
+DEADLINE_EMBED_TIMEOUT = float(os.getenv("DEADLINE_EMBED_TIMEOUT", "3"))       # 查询向量化最多等待（秒），超时改用 BM25 检索
+DEADLINE_GENERATE_RESERVE = float(os.getenv("DEADLINE_GENERATE_RESERVE", "8"))  # 剩余预算不足该值时不再调用 LLM，直接返回最相关的问答原文
@@ -0,0 +1,127 @@
+# backend/db/embedding_store.py
+"""
+内存映射的向量存储
+
+单文件格式：
+    8 字节魔数 | 8 字节小端头部长度 | 头部 JSON（ids、dim、附加元数据）| 填充到 64 字节对齐 | float32 行矩阵
+读取时矩阵部分以只读 mmap 打开，多个 worker 进程共享同一份页缓存，增加进程数不会成倍增加内存。
+重建时先写临时文件再 os.replace：已打开的进程继续使用旧映射，下次检查到文件变化后重新映射。
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"EMBSTOR1"
+_ALIGN = 64
+
+
+def write_store(path: str, ids: Sequence[str], matrix: np.ndarray, meta: Optional[Dict[str, Any]] = None) -> None:
+    """原子写入：先写同目录临时文件并落盘，再替换目标文件"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(f"矩阵形状 {matrix.shape} 与 id 数量 {len(ids)} 不一致")
+    header = json.dumps(
+        {"ids": list(ids), "dim": int(matrix.shape[1]), "count": int(matrix.shape[0]), "meta": meta or {}},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    data_offset = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(b"\0" * (data_offset - f.tell()))
+            f.write(matrix.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class EmbeddingStore:
+    """只读视图：ids[i] 对应 matrix 第 i 行，matrix 为 np.memmap"""
+
+    def __init__(self, path: str, ids: List[str], matrix: np.ndarray, meta: Dict[str, Any]):
+        self.path = path
+        self.ids = ids
+        self.matrix = matrix
+        self.meta = meta
+        self._positions = {item_id: n for n, item_id in enumerate(ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    @classmethod
+    def open(cls, path: str) -> "EmbeddingStore":
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"不是向量存储文件: {path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        data_offset = -(-(len(_MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+        count, dim = header["count"], header["dim"]
+        if count and dim:
+            matrix = np.memmap(path, dtype=np.float32, mode="r", offset=data_offset, shape=(count, dim))
+        else:
+            matrix = np.zeros((0, dim), dtype=np.float32)
+        return cls(path, header["ids"], matrix, header.get("meta") or {})
+
+    def position(self, item_id: str) -> Optional[int]:
+        return self._positions.get(item_id)
+
+    def vector(self, item_id: str) -> Optional[np.ndarray]:
+        n = self._positions.get(item_id)
+        return None if n is None else self.matrix[n]
+
+
+class StoreWatcher:
+    """
+    按文件标识（inode + 修改时间 + 大小）检测存储文件被替换，变化时调用 loader 重新打开。
+    get() 至多每 check_interval 秒 stat 一次文件，热路径开销可以忽略。
+    """
+
+    def __init__(self, path: str, loader, check_interval: float = 5.0):
+        self.path = path
+        self._loader = loader
+        self.check_interval = check_interval
+        self._value = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._value is not None and now - self._checked_at < self.check_interval:
+            return self._value
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return self._value
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if signature != self._signature:
+                try:
+                    self._value = self._loader(self.path)
+                    self._signature = signature
+                except Exception as e:
+                    logger.error(f"[EMBED_STORE] 加载 {self.path} 失败: {e}")
+            return self._value
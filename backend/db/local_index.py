@@ -0,0 +1,165 @@
+# backend/db/local_index.py
+"""
+进程内知识库检索引擎
+
+知识库规模不大（数千条问答）时，整个库放在内存里检索比每次请求访问 Weaviate 快得多：
+- 向量检索：所有问答向量按行存放在 L2 归一化的 float32 矩阵中，精确余弦相似度 = 一次矩阵-向量乘法
+- 文本检索：问题/答案/关键词建 BM25 倒排索引（与意图识别共用 workflow.scoring）
+- 混合检索：两路排名按加权倒数排名融合（RRF），与 Weaviate hybrid 的 rankedFusion 算法一致
+索引由导入脚本在写入 Weaviate 的同时生成，保存为内存映射向量存储（db.embedding_store），
+多个 worker 进程共享同一份向量页缓存；后端检测到文件被替换后自动重新加载。
+"""
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from db.embedding_store import EmbeddingStore, StoreWatcher, write_store
+from workflow.scoring import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# 问题最能代表一条知识的主题，答案正文次之
+KNOWLEDGE_FIELD_WEIGHTS = {
+    'question': 2.0,
+    'answer': 1.0,
+    'keywords': 0.5,
+}
+
+# 融合前每一路至少取多少候选：只在某一路排名靠前的文档也有机会进入最终结果
+_FUSION_CANDIDATES = 20
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], weights: Sequence[float],
+                           k: int = 60) -> List[tuple]:
+    """
+    加权倒数排名融合：score(d) = Σ w_i / (k + rank_i(d))，rank 从 1 开始。
+    rankings 为各路按相关度降序的文档序号，返回 [(文档序号, 融合得分)]，按得分降序。
+    """
+    fused: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+class LocalKnowledgeIndex:
+    """只读索引：docs[i] 对应 matrix 第 i 行（无向量时 matrix 为 (0, 0)）"""
+
+    def __init__(self, docs: List[Dict[str, Any]], matrix: Optional[np.ndarray] = None, model: str = "",
+                 normalized: bool = False):
+        self.docs = docs
+        self.model = model
+        if matrix is None or not len(matrix):
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+        elif normalized:
+            # 从存储文件映射进来的矩阵已归一化，直接使用，不复制
+            self.matrix = matrix
+        else:
+            matrix = np.asarray(matrix, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        self.bm25 = BM25Index.build(docs, field_weights=KNOWLEDGE_FIELD_WEIGHTS)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @property
+    def has_vectors(self) -> bool:
+        return self.matrix.shape[0] == len(self.docs) and self.matrix.shape[0] > 0
+
+    @classmethod
+    def build(cls, knowledge_list: Sequence[Dict[str, Any]], vectors: Optional[Sequence] = None,
+              model: str = "") -> "LocalKnowledgeIndex":
+        docs = [
+            {
+                "question": item.get("question") or "",
+                "answer": item.get("answer") or "",
+                "source": item.get("source") or "",
+                "keywords": list(item.get("keywords") or []),
+            }
+            for item in knowledge_list
+        ]
+        matrix = None
+        if vectors is not None and len(vectors) == len(docs) and len(docs):
+            matrix = np.vstack([np.asarray(v, dtype=np.float32).ravel() for v in vectors])
+        return cls(docs, matrix, model)
+
+    # ---------- 检索 ----------
+    def search_vector(self, query_vector, top_k: int = 3) -> List[Dict[str, Any]]:
+        return [dict(self.docs[i], score=score) for i, score in self._rank_vector(query_vector, top_k)]
+
+    def _rank_vector(self, query_vector, top_k: int) -> List[tuple]:
+        if not self.has_vectors:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        if query.shape[0] != self.matrix.shape[1]:
+            logger.warning(f"[LOCAL_INDEX] 查询向量维度 {query.shape[0]} 与索引 {self.matrix.shape[1]} 不一致")
+            return []
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return []
+        scores = self.matrix @ (query / norm)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def search_text(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        ranked, _ = self.bm25.top(query, top_k)
+        return [dict(self.docs[i], score=score) for i, score in ranked]
+
+    def search_hybrid(self, query_text: str, query_vector, top_k: int = 3, alpha: float = 0.5,
+                      rrf_k: int = 60) -> List[Dict[str, Any]]:
+        """BM25 与向量两路各取候选，按 (1 - alpha, alpha) 加权做倒数排名融合"""
+        depth = max(top_k * 4, _FUSION_CANDIDATES)
+        lexical, _ = self.bm25.top(query_text, depth)
+        semantic = self._rank_vector(query_vector, depth) if query_vector is not None else []
+        fused = reciprocal_rank_fusion(
+            [[i for i, _ in lexical], [i for i, _ in semantic]],
+            [1.0 - alpha, alpha],
+            rrf_k,
+        )
+        return [dict(self.docs[i], score=score) for i, score in fused[:top_k]]
+
+    def search(self, query: Any, top_k: int = 3, query_text: Optional[str] = None,
+               hybrid: bool = False, alpha: float = 0.5, rrf_k: int = 60) -> List[Dict[str, Any]]:
+        """
+        与 retrieve_context 相同的输入约定：向量走矩阵检索，字符串走 BM25；
+        hybrid 且有问题原文时两路融合。
+        """
+        text = query if isinstance(query, str) else query_text
+        if hybrid and text:
+            return self.search_hybrid(text, None if isinstance(query, str) else query, top_k, alpha, rrf_k)
+        if isinstance(query, str):
+            return self.search_text(query, top_k)
+        return self.search_vector(query, top_k)
+
+    # ---------- 持久化 ----------
+    def save(self, path: str) -> None:
+        """写入内存映射存储（先写临时文件再替换，运行中的后端不会读到半个文件）"""
+        try:
+            write_store(
+                path,
+                [str(n) for n in range(self.matrix.shape[0])],
+                self.matrix,
+                {"model": self.model, "docs": self.docs},
+            )
+            logger.info(f"[LOCAL_INDEX] 本地检索索引已保存: {path} ({len(self.docs)} 条)")
+        except Exception as e:
+            logger.error(f"[LOCAL_INDEX] 保存本地检索索引失败 {path}: {e}")
+
+    @classmethod
+    def load(cls, path: str) -> "LocalKnowledgeIndex":
+        store = EmbeddingStore.open(path)
+        index = cls(store.meta.get("docs") or [], store.matrix, store.meta.get("model", ""), normalized=True)
+        logger.info(f"[LOCAL_INDEX] 已加载本地检索索引: {len(index)} 条")
+        return index
+
+
+def local_index_watcher(path: str) -> StoreWatcher:
+    """按文件变化懒加载/重新加载索引，供检索热路径使用"""
+    return StoreWatcher(path, LocalKnowledgeIndex.load)
@@ -1,7 +1,7 @@
 # backend/db/sql_repo.py
 import os
 import sys
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import create_engine, text, Column, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -84,6 +84,14 @@ def initialize_db():
         logger.error(f"[SQL_REPO] ✗ 数据库初始化失败: {e}")
         return False
 
+def ping_db() -> bool:
+    """执行 SELECT 1 检查数据库连接；尚未初始化时返回 False"""
+    if engine is None:
+        return False
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return True
+
 def get_db_session():
     """获取数据库会话"""
     if SessionLocal is None:
@@ -2,11 +2,21 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import re
+import threading
+import time
+from functools import lru_cache
 from typing import Any, Dict, List
 
+import numpy as np
 import requests
 
+from runtime.http import get_session, get_async_client
+from runtime.health import health_monitor
+from runtime.endpoints import EndpointResolver
+from db.local_index import LocalKnowledgeIndex, local_index_watcher
+
 # 统一从 config.settings 读取；若 WEAVIATE_RAG_CLASS 不存在，用默认类名
 try:
     from config.settings import WEAVIATE_URL, WEAVIATE_RAG_CLASS, WEAVIATE_AUTO_VECTORIZE  # type: ignore
@@ -15,9 +25,31 @@ except Exception:
     WEAVIATE_RAG_CLASS = "Knowledge"
     WEAVIATE_AUTO_VECTORIZE = False
 
+try:
+    from config.settings import KNOWLEDGE_VERSION_FILE  # type: ignore
+except Exception:
+    KNOWLEDGE_VERSION_FILE = ""
+
+from config.settings import (  # type: ignore
+    WEAVIATE_CONNECT_TIMEOUT, WEAVIATE_READY_TIMEOUT, WEAVIATE_SCHEMA_TIMEOUT,
+    WEAVIATE_QUERY_TIMEOUT, WEAVIATE_BATCH_TIMEOUT,
+    WEAVIATE_FAILURE_THRESHOLD, WEAVIATE_CIRCUIT_RESET,
+    RETRIEVAL_ENGINE, LOCAL_INDEX_PATH,
+    HYBRID_SEARCH_ENABLED, HYBRID_ALPHA, HYBRID_RRF_K,
+)
+
 logger = logging.getLogger(__name__)
 
 
+def _session() -> requests.Session:
+    """Weaviate 共享连接池（keep-alive）"""
+    return get_session("weaviate")
+
+
+def _timeout(read_timeout: float) -> tuple:
+    return (min(WEAVIATE_CONNECT_TIMEOUT, read_timeout), read_timeout)
+
+
 # ---------- URL 回退（容器名 -> localhost） ----------
 def _get_fallback_url(base_url: str) -> str:
     """
@@ -33,60 +65,62 @@ def _get_fallback_url(base_url: str) -> str:
     return base_url
 
 
+# ---------- 端点选择与熔断 ----------
+# 候选地址：配置的 WEAVIATE_URL 与其 localhost 回退地址；记住最近成功的地址，连续失败则熔断
+_resolver = EndpointResolver(
+    "weaviate",
+    [WEAVIATE_URL, _get_fallback_url(WEAVIATE_URL)],
+    failure_threshold=WEAVIATE_FAILURE_THRESHOLD,
+    reset_timeout=WEAVIATE_CIRCUIT_RESET,
+)
+
+
+def endpoint_state() -> dict:
+    """当前首选地址与各地址的熔断状态（供健康检查输出）"""
+    return _resolver.snapshot()
+
+
+def _check_status(r):
+    """5xx 视为该地址故障（计入熔断），其余状态码交给调用方判断"""
+    if r.status_code >= 500:
+        raise requests.HTTPError(f"{r.status_code} {r.text[:200]}", response=r)
+    return r
+
+
+def _request(method: str, path: str, read_timeout: float, **kwargs) -> requests.Response:
+    return _resolver.call(
+        lambda base: _check_status(_session().request(method, f"{base}{path}", timeout=_timeout(read_timeout), **kwargs))
+    )
+
+
 # ---------- 健康检查 ----------
-def _http_is_ready(timeout: int = 5) -> bool:
-    url = f"{WEAVIATE_URL}/v1/.well-known/ready"
+def _http_is_ready(timeout: float = WEAVIATE_READY_TIMEOUT) -> bool:
     try:
-        r = requests.get(url, timeout=timeout)
-        return r.status_code == 200
+        return _request("GET", "/v1/.well-known/ready", timeout).status_code == 200
     except Exception as e:
         logger.error("[WEAVIATE-HTTP] 就绪检查失败: %s", e)
-        fb = _get_fallback_url(WEAVIATE_URL)
-        if fb != WEAVIATE_URL:
-            try:
-                r = requests.get(f"{fb}/v1/.well-known/ready", timeout=timeout)
-                return r.status_code == 200
-            except Exception as e2:
-                logger.error("[WEAVIATE-HTTP] 回退URL就绪检查失败: %s", e2)
         return False
 
 
 # ---------- Schema 相关 ----------
 def _http_get_schema() -> dict[str, Any]:
-    url = f"{WEAVIATE_URL}/v1/schema"
     try:
-        r = requests.get(url, timeout=10)
+        r = _request("GET", "/v1/schema", WEAVIATE_SCHEMA_TIMEOUT)
         r.raise_for_status()
         return r.json()
     except Exception as e:
         logger.error("[WEAVIATE-HTTP] 获取 schema 失败: %s", e)
-        fb = _get_fallback_url(WEAVIATE_URL)
-        if fb != WEAVIATE_URL:
-            try:
-                r = requests.get(f"{fb}/v1/schema", timeout=10)
-                r.raise_for_status()
-                return r.json()
-            except Exception as e2:
-                logger.error("[WEAVIATE-HTTP] 回退URL获取 schema 失败: %s", e2)
         return {}
 
 
 def _http_create_class(knowledge_class: dict[str, Any]) -> bool:
-    url = f"{WEAVIATE_URL}/v1/schema"
     try:
-        r = requests.post(url, json=knowledge_class, timeout=15)
+        r = _request("POST", "/v1/schema", WEAVIATE_SCHEMA_TIMEOUT, json=knowledge_class)
         if r.status_code in (200, 201):
             return True
         logger.error("[WEAVIATE-HTTP] 创建类失败: %s %s", r.status_code, r.text)
     except Exception as e:
         logger.error("[WEAVIATE-HTTP] 创建类异常: %s", e)
-        fb = _get_fallback_url(WEAVIATE_URL)
-        if fb != WEAVIATE_URL:
-            try:
-                r = requests.post(f"{fb}/v1/schema", json=knowledge_class, timeout=15)
-                return r.status_code in (200, 201)
-            except Exception as e2:
-                logger.error("[WEAVIATE-HTTP] 回退URL创建类异常: %s", e2)
     return False
 
 
@@ -98,7 +132,8 @@ def _http_batch_insert(
     try:
         if vectors and len(vectors) == len(knowledge_list):
             objects = [
-                {"class": WEAVIATE_RAG_CLASS, "properties": data, "vector": vec}
+                {"class": WEAVIATE_RAG_CLASS, "properties": data,
+                 "vector": np.asarray(vec, dtype=np.float32).tolist()}
                 for data, vec in zip(knowledge_list, vectors)
             ]
         else:
@@ -107,7 +142,7 @@ def _http_batch_insert(
                 for data in knowledge_list
             ]
         payload = {"objects": objects}
-        r = requests.post(f"{WEAVIATE_URL}/v1/batch/objects", json=payload, timeout=30)
+        r = _request("POST", "/v1/batch/objects", WEAVIATE_BATCH_TIMEOUT, json=payload)
         if r.status_code not in (200, 202):
             logger.error("[WEAVIATE-HTTP] 批量写入失败: %s %s", r.status_code, r.text)
             return 0
@@ -128,63 +163,34 @@ def _http_batch_insert(
         return success
     except Exception as e:
         logger.error("[WEAVIATE-HTTP] 批量写入异常: %s", e)
-        fb = _get_fallback_url(WEAVIATE_URL)
-        if fb != WEAVIATE_URL:
-            try:
-                if vectors and len(vectors) == len(knowledge_list):
-                    payload = {
-                        "objects": [
-                            {"class": WEAVIATE_RAG_CLASS, "properties": d, "vector": v}
-                            for d, v in zip(knowledge_list, vectors)
-                        ]
-                    }
-                else:
-                    payload = {
-                        "objects": [
-                            {"class": WEAVIATE_RAG_CLASS, "properties": d}
-                            for d in knowledge_list
-                        ]
-                    }
-                r = requests.post(f"{fb}/v1/batch/objects", json=payload, timeout=30)
-                if r.status_code not in (200, 202):
-                    logger.error("[WEAVIATE-HTTP] 回退URL批量写入失败: %s %s", r.status_code, r.text)
-                    return 0
-                body = r.json()
-                if isinstance(body, list):
-                    results = body
-                else:
-                    results = body.get("objects") or body.get("results") or body.get("Object") or []
-                if not results:
-                    return len(payload["objects"])
-                success = 0
-                for item in results:
-                    status = item.get("status") or (item.get("result") or {}).get("status")
-                    if isinstance(status, str) and status.upper() == "SUCCESS":
-                        success += 1
-                    elif "errors" not in item:
-                        success += 1
-                return success
-            except Exception as e2:
-                logger.error("[WEAVIATE-HTTP] 回退URL批量写入异常: %s", e2)
         return 0
 
 
 # ---------- GraphQL ----------
-def _http_graphql(query: str) -> dict[str, Any]:
+def _graphql_body(r) -> dict[str, Any]:
+    """解析 GraphQL 响应；查询本身出错（如向量维度与索引不符）时 Weaviate 返回 200 与 errors，同样抛出"""
+    r.raise_for_status()
+    body = r.json()
+    if body.get("errors"):
+        raise RuntimeError(f"GraphQL 错误: {body['errors'][0].get('message', body['errors'][0])}")
+    return body
+
+
+def _graphql(query: str, timeout: float | None = None) -> dict[str, Any]:
+    """
+    timeout 为调用方剩余的请求预算，缺省时按 WEAVIATE_QUERY_TIMEOUT。
+    失败时抛出（EndpointUnavailable、超时、HTTP 与 GraphQL 错误），由调用方决定降级方式。
+    """
+    read_timeout = WEAVIATE_QUERY_TIMEOUT if timeout is None else min(WEAVIATE_QUERY_TIMEOUT, timeout)
+    return _graphql_body(_request("POST", "/v1/graphql", read_timeout, json={"query": query}))
+
+
+def _http_graphql(query: str, timeout: float | None = None) -> dict[str, Any]:
+    """_graphql 的容错版本：失败时记录日志并返回空 dict"""
     try:
-        r = requests.post(f"{WEAVIATE_URL}/v1/graphql", json={"query": query}, timeout=15)
-        r.raise_for_status()
-        return r.json()
+        return _graphql(query, timeout)
     except Exception as e:
         logger.error("[WEAVIATE-HTTP] GraphQL 请求失败: %s", e)
-        fb = _get_fallback_url(WEAVIATE_URL)
-        if fb != WEAVIATE_URL:
-            try:
-                r = requests.post(f"{fb}/v1/graphql", json={"query": query}, timeout=15)
-                r.raise_for_status()
-                return r.json()
-            except Exception as e2:
-                logger.error("[WEAVIATE-HTTP] 回退URL GraphQL 请求失败: %s", e2)
         return {}
 
 # ---------- Public API for Data Ingestion ----------
@@ -237,114 +243,175 @@ def batch_insert_knowledge(
     """
     if not knowledge_list:
         return 0
-    return _http_batch_insert(knowledge_list, vectors)
+    inserted = _http_batch_insert(knowledge_list, vectors)
+    if inserted > 0:
+        bump_knowledge_version()
+    return inserted
 
 
-# ---------- 导出给 RAG 使用 ----------
-def retrieve_context(query: Any, top_k: int = 3) -> list[str]:
+# ---------- 知识库版本标记 ----------
+def bump_knowledge_version() -> None:
     """
-    兼容两种输入：
-    - 若 query 是向量(list[float])：使用 nearVector 检索；
-    - 若 query 是字符串：使用 bm25 检索。
-    统一返回：每条上下文以字符串形式给到上层（便于拼接 Prompt）。
+    知识库内容变化后调用：更新版本标记文件，运行中的后端据此让答案缓存等失效。
+    先写临时文件再替换，读取方不会看到半写入的内容。
     """
-    if not _http_is_ready():
-        logger.warning("[WEAVIATE] 实例未就绪，返回空上下文。")
-        return []
-
+    if not KNOWLEDGE_VERSION_FILE:
+        return
+    tmp_path = f"{KNOWLEDGE_VERSION_FILE}.{os.getpid()}.tmp"
     try:
-        if isinstance(query, (list, tuple)):  # nearVector
-            gql = f"""
-            {{
-              Get {{
-                {WEAVIATE_RAG_CLASS}(
-                  nearVector: {{ vector: {json.dumps(list(query))} }}
-                  limit: {int(top_k)}
-                ) {{
-                  question
-                  answer
-                  source
-                }}
-              }}
-            }}
-            """
-        else:
-            if WEAVIATE_AUTO_VECTORIZE:
-                gql = f"""
-                {{
-                  Get {{
-                    {WEAVIATE_RAG_CLASS}(
-                      nearText: {{ concepts: [{json.dumps(str(query))}] }}
-                      limit: {int(top_k)}
-                    ) {{
-                      question
-                      answer
-                      source
-                    }}
-                  }}
-                }}
-                """
-            else:
-                gql = f"""
-                {{
-                  Get {{
-                    {WEAVIATE_RAG_CLASS}(
-                      bm25: {{ query: {json.dumps(str(query))} }}
-                      limit: {int(top_k)}
-                    ) {{
-                      question
-                      answer
-                      source
-                    }}
-                  }}
-                }}
-                """
-
-        data = _http_graphql(gql)
-        hits = (((data or {}).get("data") or {}).get("Get") or {}).get(WEAVIATE_RAG_CLASS, []) or []
-        if WEAVIATE_AUTO_VECTORIZE and not isinstance(query, (list, tuple)) and not hits:
-            gql_bm25 = f"""
-            {{
-              Get {{
-                {WEAVIATE_RAG_CLASS}(
-                  bm25: {{ query: {json.dumps(str(query))} }}
-                  limit: {int(top_k)}
-                ) {{
+        os.makedirs(os.path.dirname(os.path.abspath(KNOWLEDGE_VERSION_FILE)), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(repr(time.time()))
+        os.replace(tmp_path, KNOWLEDGE_VERSION_FILE)
+        _version_cache["checked_at"] = 0.0  # 本进程写入后下一次读取立即生效
+        logger.info("[WEAVIATE] 知识库版本已更新: %s", KNOWLEDGE_VERSION_FILE)
+    except Exception as e:
+        logger.error("[WEAVIATE] 更新知识库版本标记失败: %s", e)
+
+
+# 版本标记在热路径上每个请求要读 2~3 次：缓存读到的内容，至多每 _VERSION_CHECK_INTERVAL 秒 stat 一次，
+# 文件标识（inode + 修改时间 + 大小）变化时才重新读取（与 embedding_store.StoreWatcher 相同）
+_VERSION_CHECK_INTERVAL = 1.0
+_version_cache: Dict[str, Any] = {"value": "", "signature": None, "checked_at": 0.0}
+_version_lock = threading.Lock()
+
+
+def get_knowledge_version() -> str:
+    """返回当前知识库版本；标记文件不存在时返回空字符串"""
+    if not KNOWLEDGE_VERSION_FILE:
+        return ""
+    now = time.monotonic()
+    if now - _version_cache["checked_at"] < _VERSION_CHECK_INTERVAL:
+        return _version_cache["value"]
+    with _version_lock:
+        if now - _version_cache["checked_at"] < _VERSION_CHECK_INTERVAL:
+            return _version_cache["value"]
+        try:
+            st = os.stat(KNOWLEDGE_VERSION_FILE)
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if signature != _version_cache["signature"]:
+                with open(KNOWLEDGE_VERSION_FILE, "r", encoding="utf-8") as f:
+                    _version_cache["value"] = f.read().strip()
+                _version_cache["signature"] = signature
+        except OSError:
+            _version_cache["value"], _version_cache["signature"] = "", None
+        _version_cache["checked_at"] = now
+        return _version_cache["value"]
+
+
+# ---------- 查询构建与结果解析（同步/异步共用） ----------
+_RESULT_FIELDS = """
                   question
                   answer
                   source
-                }}
-              }}
-            }}
-            """
-            data2 = _http_graphql(gql_bm25)
-            hits = (((data2 or {}).get("data") or {}).get("Get") or {}).get(WEAVIATE_RAG_CLASS, []) or []
-        contexts: list[str] = []
-        for h in hits:
-            question = h.get("question")
-            answer = h.get("answer")
-            source = h.get("source")
-            if answer:
-                ctx = f"{answer}"
-                if question:
-                    ctx = f"{question}\n{answer}"
-                if source:
-                    ctx = f"{source}\n{ctx}"
-                contexts.append(ctx)
-        return contexts
-    except Exception as e:
-        logger.error("[WEAVIATE] retrieve_context 失败: %s", e)
-        return []
+                  _additional { score distance }
+"""
 
 
-def get_knowledge_count() -> int:
+def _is_vector(query: Any) -> bool:
+    return isinstance(query, (list, tuple, np.ndarray))
+
+
+def encode_vector(vector: Any) -> str:
     """
-    返回类 {WEAVIATE_RAG_CLASS} 的对象数量
+    把向量编码为 GraphQL 数组字面量的内容：先转为 float32，再按 6 位有效数字输出。
+    相比 json.dumps(float64 列表)，1024 维向量的文本约缩小一半、编码耗时约减半，
+    6 位有效数字对余弦相似度排序没有影响。
     """
-    if not _http_is_ready():
-        return 0
-    try:
-        gql = f"""
+    values = np.asarray(vector, dtype=np.float32).ravel().tolist()
+    return ",".join(["%.6g" % v for v in values])
+
+
+@lru_cache(maxsize=64)
+def _query_template(search_kind: str, top_k: int) -> tuple[str, str]:
+    """
+    按 (检索方式, top_k) 预先生成查询模板，返回 (前缀, 后缀)，调用时只需在中间拼入检索参数。
+    Weaviate 的 GraphQL 不支持用变量传 nearVector 参数，因此向量仍以字面量内联。
+    """
+    openers = {
+        "nearVector": "nearVector: { vector: [",
+        "nearText": "nearText: { concepts: [",
+        "bm25": "bm25: { query: ",
+        "hybrid": "hybrid: { query: ",
+    }
+    closers = {
+        "nearVector": "] }",
+        "nearText": "] }",
+        "bm25": " }",
+        # rankedFusion：两路按排名倒数加权融合，不受 BM25 与余弦得分量纲不同的影响
+        "hybrid": f" alpha: {float(HYBRID_ALPHA)} fusionType: rankedFusion }}",
+    }
+    prefix = f"{{ Get {{ {WEAVIATE_RAG_CLASS}( {openers[search_kind]}"
+    suffix = f"{closers[search_kind]} limit: {int(top_k)} ) {{ {' '.join(_RESULT_FIELDS.split())} }} }} }}"
+    return prefix, suffix
+
+
+def _build_get_query(query: Any, top_k: int, force_bm25: bool = False, query_text: str | None = None) -> str:
+    """
+    - 开启混合检索且有问题原文：hybrid，一次请求同时取 BM25 与向量排名
+      （向量由调用方传入；自动向量化模式下由 Weaviate 对原文向量化）
+    - 向量(np.ndarray / list[float])：nearVector
+    - 字符串：自动向量化模式下 nearText，否则 bm25（force_bm25 时总是 bm25）
+    """
+    text = query if isinstance(query, str) else query_text
+    if HYBRID_SEARCH_ENABLED and text and not force_bm25 and (_is_vector(query) or WEAVIATE_AUTO_VECTORIZE):
+        prefix, suffix = _query_template("hybrid", top_k)
+        vector = f" vector: [{encode_vector(query)}]" if _is_vector(query) else ""
+        return prefix + json.dumps(str(text), ensure_ascii=False) + vector + suffix
+    if _is_vector(query):
+        prefix, suffix = _query_template("nearVector", top_k)
+        return prefix + encode_vector(query) + suffix
+    kind = "nearText" if WEAVIATE_AUTO_VECTORIZE and not force_bm25 else "bm25"
+    prefix, suffix = _query_template(kind, top_k)
+    return prefix + json.dumps(str(query), ensure_ascii=False) + suffix
+
+
+def _extract_hits(data: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    解析为 {question, answer, source, score}：bm25 / hybrid 取 Weaviate 返回的 score，
+    nearVector / nearText 只有余弦距离，换算为相似度 1 - distance。
+    """
+    raw = (((data or {}).get("data") or {}).get("Get") or {}).get(WEAVIATE_RAG_CLASS, []) or []
+    hits = []
+    for h in raw:
+        extra = h.get("_additional") or {}
+        score = extra.get("score")
+        if score is not None:
+            score = float(score)
+        elif extra.get("distance") is not None:
+            score = 1.0 - float(extra["distance"])
+        hits.append({
+            "question": h.get("question") or "",
+            "answer": h.get("answer") or "",
+            "source": h.get("source") or "",
+            "score": score,
+        })
+    return hits
+
+
+def _needs_bm25_fallback(query: Any, hits: list[dict[str, Any]]) -> bool:
+    """自动向量化模式下 nearText 无结果时，再用 bm25 检索一次（混合检索已包含 BM25，不需要）"""
+    return WEAVIATE_AUTO_VECTORIZE and not HYBRID_SEARCH_ENABLED and not _is_vector(query) and not hits
+
+
+def _hits_to_contexts(hits: list[dict[str, Any]]) -> list[str]:
+    """统一返回：每条上下文以字符串形式给到上层（便于拼接 Prompt）"""
+    contexts: list[str] = []
+    for h in hits:
+        question = h.get("question")
+        answer = h.get("answer")
+        source = h.get("source")
+        if answer:
+            ctx = f"{answer}"
+            if question:
+                ctx = f"{question}\n{answer}"
+            if source:
+                ctx = f"{source}\n{ctx}"
+            contexts.append(ctx)
+    return contexts
+
+
+_COUNT_QUERY = f"""
         {{
           Aggregate {{
             {WEAVIATE_RAG_CLASS} {{
@@ -353,12 +420,173 @@ def get_knowledge_count() -> int:
           }}
         }}
         """
-        data = _http_graphql(gql)
-        agg = (((data or {}).get("data") or {}).get("Aggregate") or {}).get(WEAVIATE_RAG_CLASS, [])
-        if agg and isinstance(agg, list):
-            meta = agg[0].get("meta") or {}
-            return int(meta.get("count") or 0)
+
+
+def _parse_count(data: dict[str, Any]) -> int:
+    agg = (((data or {}).get("data") or {}).get("Aggregate") or {}).get(WEAVIATE_RAG_CLASS, [])
+    if agg and isinstance(agg, list):
+        meta = agg[0].get("meta") or {}
+        return int(meta.get("count") or 0)
+    return 0
+
+
+# ---------- 本地检索引擎 ----------
+# RETRIEVAL_ENGINE: weaviate（默认）| local（只用进程内索引）| auto（Weaviate 不可用时改用本地索引）
+_local_index = local_index_watcher(LOCAL_INDEX_PATH)
+
+
+def save_local_index(knowledge_list: list[dict[str, Any]], vectors: list[Any], model: str = "") -> None:
+    """由导入脚本调用：用与写入 Weaviate 相同的数据生成本地检索索引"""
+    if not LOCAL_INDEX_PATH:
+        return
+    LocalKnowledgeIndex.build(knowledge_list, vectors or None, model).save(LOCAL_INDEX_PATH)
+
+
+def _local_retrieve(query: Any, top_k: int, query_text: str | None = None) -> list[dict[str, Any]]:
+    index = _local_index.get()
+    if index is None:
+        logger.warning("[LOCAL_INDEX] 本地检索索引不存在，请先运行导入脚本: %s", LOCAL_INDEX_PATH)
+        return []
+    hits = index.search(query, top_k, query_text=query_text, hybrid=HYBRID_SEARCH_ENABLED,
+                        alpha=HYBRID_ALPHA, rrf_k=HYBRID_RRF_K)
+    return [{k: h.get(k) for k in ("question", "answer", "source", "score")} for h in hits]
+
+
+def _local_count() -> int:
+    index = _local_index.get()
+    return len(index) if index is not None else 0
+
+
+def _use_local_first() -> bool:
+    """local 模式，或 auto 模式下后台健康检查判定 Weaviate 不可用"""
+    return RETRIEVAL_ENGINE == "local" or (RETRIEVAL_ENGINE == "auto" and health_monitor.is_down("weaviate"))
+
+
+# ---------- 导出给 RAG 使用 ----------
+def retrieve_context(query: Any, top_k: int = 3, query_text: str | None = None) -> list[str]:
+    """
+    兼容两种输入：
+    - 若 query 是向量(np.ndarray 或 list[float])：使用 nearVector 检索；
+    - 若 query 是字符串：使用 bm25 检索。
+    开启混合检索（HYBRID_SEARCH_ENABLED）时，向量与问题原文 query_text 在同一请求中做 hybrid 检索。
+    统一返回：每条上下文以字符串形式给到上层（便于拼接 Prompt）。
+    """
+    return _hits_to_contexts(retrieve_hits(query, top_k, query_text))
+
+
+def retrieve_hits(query: Any, top_k: int = 3, query_text: str | None = None,
+                  timeout: float | None = None) -> list[dict[str, Any]]:
+    """
+    与 retrieve_context 相同的检索，返回按相关度降序的 {question, answer, source, score}
+    timeout 为调用方剩余的请求预算（秒），Weaviate 请求不会等待超过它
+    Weaviate 请求失败时：auto 模式改用本地检索索引，否则抛出异常，由调用方改用关键词检索重试或报错，
+    不会把失败当作"没有相关知识"。
+    """
+    if _use_local_first():
+        return _local_retrieve(query, top_k, query_text)
+
+    # 就绪状态由后台健康检查维护，这里只读取缓存结果
+    if health_monitor.is_down("weaviate"):
+        logger.warning("[WEAVIATE] 实例未就绪，返回空上下文。")
+        return []
+
+    try:
+        hits = _extract_hits(_graphql(_build_get_query(query, top_k, query_text=query_text), timeout))
+        if _needs_bm25_fallback(query, hits):
+            hits = _extract_hits(_graphql(_build_get_query(query, top_k, force_bm25=True), timeout))
+        return hits
+    except Exception as e:
+        if RETRIEVAL_ENGINE == "auto":
+            logger.warning("[WEAVIATE] 检索请求失败，改用本地检索索引: %s", e)
+            return _local_retrieve(query, top_k, query_text)
+        logger.error("[WEAVIATE] retrieve_hits 失败: %s", e)
+        raise
+
+
+def get_knowledge_count(timeout: float | None = None) -> int:
+    """
+    返回类 {WEAVIATE_RAG_CLASS} 的对象数量（本地检索模式下为本地索引的条数）
+    """
+    if _use_local_first():
+        return _local_count()
+    if health_monitor.is_down("weaviate"):
         return 0
+    try:
+        data = _http_graphql(_COUNT_QUERY, timeout)
+        if not data and RETRIEVAL_ENGINE == "auto":
+            return _local_count()
+        return _parse_count(data)
     except Exception as e:
         logger.error("[WEAVIATE] get_knowledge_count 失败: %s", e)
-        return 0
\ No newline at end of file
+        return 0
+
+
+# ---------- 异步版本（供 async_app 使用，不占用工作线程等待 Weaviate） ----------
+async def _graphql_async(query: str, timeout: float | None = None) -> dict[str, Any]:
+    """_graphql 的异步版本，失败时同样抛出"""
+    client = get_async_client("weaviate")
+    read_timeout = WEAVIATE_QUERY_TIMEOUT if timeout is None else min(WEAVIATE_QUERY_TIMEOUT, timeout)
+
+    async def _post(base: str):
+        return _check_status(await client.post(f"{base}/v1/graphql", json={"query": query},
+                                               timeout=_async_timeout(read_timeout)))
+
+    return _graphql_body(await _resolver.call_async(_post))
+
+
+async def _http_graphql_async(query: str, timeout: float | None = None) -> dict[str, Any]:
+    """_graphql_async 的容错版本：失败时记录日志并返回空 dict"""
+    try:
+        return await _graphql_async(query, timeout)
+    except Exception as e:
+        logger.error("[WEAVIATE-HTTP] GraphQL 请求失败: %s", e)
+        return {}
+
+
+def _async_timeout(read_timeout: float):
+    import httpx
+    return httpx.Timeout(read_timeout, connect=min(WEAVIATE_CONNECT_TIMEOUT, read_timeout))
+
+
+async def retrieve_context_async(query: Any, top_k: int = 3, query_text: str | None = None) -> list[str]:
+    """retrieve_context 的异步版本，输入输出约定相同"""
+    return _hits_to_contexts(await retrieve_hits_async(query, top_k, query_text))
+
+
+async def retrieve_hits_async(query: Any, top_k: int = 3, query_text: str | None = None,
+                              timeout: float | None = None) -> list[dict[str, Any]]:
+    """retrieve_hits 的异步版本"""
+    if _use_local_first():
+        return _local_retrieve(query, top_k, query_text)
+
+    if health_monitor.is_down("weaviate"):
+        logger.warning("[WEAVIATE] 实例未就绪，返回空上下文。")
+        return []
+
+    try:
+        hits = _extract_hits(await _graphql_async(_build_get_query(query, top_k, query_text=query_text), timeout))
+        if _needs_bm25_fallback(query, hits):
+            hits = _extract_hits(await _graphql_async(_build_get_query(query, top_k, force_bm25=True), timeout))
+        return hits
+    except Exception as e:
+        if RETRIEVAL_ENGINE == "auto":
+            logger.warning("[WEAVIATE] 检索请求失败，改用本地检索索引: %s", e)
+            return _local_retrieve(query, top_k, query_text)
+        logger.error("[WEAVIATE] retrieve_hits_async 失败: %s", e)
+        raise
+
+
+async def get_knowledge_count_async(timeout: float | None = None) -> int:
+    """get_knowledge_count 的异步版本"""
+    if _use_local_first():
+        return _local_count()
+    if health_monitor.is_down("weaviate"):
+        return 0
+    try:
+        data = await _http_graphql_async(_COUNT_QUERY, timeout)
+        if not data and RETRIEVAL_ENGINE == "auto":
+            return _local_count()
+        return _parse_count(data)
+    except Exception as e:
+        logger.error("[WEAVIATE] get_knowledge_count_async 失败: %s", e)
+        return 0
@@ -19,8 +19,9 @@ sys.path.append(current_dir)
 
 # 导入本地模块
 from db.sql_repo import initialize_db, insert_task, insert_task_steps, insert_ui_element
-from db.vector_repo import initialize_weaviate, batch_insert_knowledge, get_knowledge_count
+from db.vector_repo import initialize_weaviate, batch_insert_knowledge, get_knowledge_count, save_local_index
 from llm.ollama_client import OllamaClient
+from llm.embedding_pool import EmbeddingWorkerPool
 
 # 配置日志
 logging.basicConfig(
@@ -62,7 +63,7 @@ class DataIngester:
         else:
             try:
                 test_embedding = self.ollama_client.get_embedding("测试连接")
-                if test_embedding:
+                if test_embedding is not None and test_embedding.size:
                     logger.info("✓ Ollama 服务连接正常")
                 else:
                     logger.error("✗ Ollama 服务连接失败")
@@ -168,21 +169,17 @@ class DataIngester:
         if self.auto_vectorize:
             valid_qa_pairs = qa_pairs
         else:
-            logger.info("生成向量嵌入...")
-            for i, qa in enumerate(qa_pairs):
-                try:
-                    text_for_embedding = f"问题: {qa['question']} 答案: {qa['answer']}"
-                    embedding = self.ollama_client.get_embedding(text_for_embedding)
-                    if embedding:
-                        vectors.append(embedding)
-                        valid_qa_pairs.append(qa)
-                    else:
-                        logger.warning(f"跳过第 {i+1} 个问答对（无法获取嵌入）")
-                    if (i + 1) % 10 == 0:
-                        logger.info(f"已生成嵌入 {i + 1}/{len(qa_pairs)}")
-                except Exception as e:
-                    logger.error(f"生成第 {i+1} 个问答对嵌入失败: {e}")
-                    continue
+            logger.info("生成向量嵌入（并发批量）...")
+            texts = [f"问题: {qa['question']} 答案: {qa['answer']}" for qa in qa_pairs]
+            started = time.time()
+            embeddings, errors = EmbeddingWorkerPool(self.ollama_client).embed_all(texts)
+            for i, (qa, embedding) in enumerate(zip(qa_pairs, embeddings)):
+                if embedding is not None:
+                    vectors.append(embedding)
+                    valid_qa_pairs.append(qa)
+                else:
+                    logger.error(f"生成第 {i+1} 个问答对嵌入失败: {errors.get(i, '无法获取嵌入')}")
+            logger.info(f"已生成嵌入 {len(vectors)}/{len(qa_pairs)}，耗时 {time.time() - started:.1f}s")
         
         if not valid_qa_pairs:
             logger.error("没有有效的问答对可以导入")
@@ -192,6 +189,9 @@ class DataIngester:
         logger.info(f"批量导入 {len(valid_qa_pairs)} 个问答对到 Weaviate...")
         success_count = batch_insert_knowledge(valid_qa_pairs, vectors if not self.auto_vectorize else [])
         
+        # 同时生成进程内检索索引（RETRIEVAL_ENGINE=local/auto 时使用）
+        save_local_index(valid_qa_pairs, vectors if not self.auto_vectorize else [], self.ollama_client.embed_model)
+        
         logger.info(f"✓ RAG 数据导入完成: {success_count}/{len(qa_pairs)} 成功")
         return success_count > 0
     
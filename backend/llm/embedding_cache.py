@@ -0,0 +1,189 @@
+# backend/llm/embedding_cache.py
+"""
+查询向量缓存
+
+两级结构：
+- 内存 LRU：按 (模型, 规范化文本) 缓存 float32 向量，带 TTL 和命中统计
+- 可选的 SQLite 持久层：向量以 float32 二进制 BLOB 存储，进程重启后仍可命中
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config.settings import EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_DB
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """合并连续空白并去掉首尾空白，使仅有空白差异的文本共享缓存"""
+    return " ".join((text or "").split())
+
+
+class EmbeddingCache:
+    """线程安全的 LRU + TTL 向量缓存"""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, ttl: float = EMBEDDING_CACHE_TTL,
+                 db_path: str = EMBEDDING_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    # ---------- 持久层 ----------
+    def _open_db(self, db_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text_hash TEXT NOT NULL, dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            if self.ttl > 0:
+                # 启动时顺带清理过期条目，避免文件无限增长
+                conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl,))
+            conn.commit()
+            self._db = conn
+            logger.info(f"[EMBED_CACHE] 持久化缓存已启用: {db_path}")
+        except Exception as e:
+            logger.error(f"[EMBED_CACHE] 打开持久化缓存失败，仅使用内存缓存: {e}")
+            self._db = None
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _db_get(self, model: str, text: str) -> Optional[Tuple[float, np.ndarray]]:
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT dim, vector, created_at FROM embeddings WHERE model = ? AND text_hash = ?",
+                    (model, self._text_hash(text)),
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"[EMBED_CACHE] 读取持久化缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        dim, blob, created_at = row
+        vector = np.frombuffer(blob, dtype=np.float32)
+        if vector.shape[0] != dim:
+            return None
+        return created_at, vector
+
+    def _db_put(self, model: str, text: str, vector: np.ndarray, created_at: float) -> None:
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (model, self._text_hash(text), int(vector.shape[0]), vector.tobytes(), created_at),
+                )
+                self._db.commit()
+        except Exception as e:
+            logger.warning(f"[EMBED_CACHE] 写入持久化缓存失败: {e}")
+
+    # ---------- 对外接口 ----------
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        """命中时返回只读的 float32 向量，否则返回 None"""
+        key = (model, normalize_text(text))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        if self._db is not None:
+            stored = self._db_get(model, key[1])
+            if stored is not None and not self._expired(stored[0], now):
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, stored[0], stored[1])
+                return stored[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model: str, text: str, vector) -> np.ndarray:
+        """写入缓存并返回规范化后的 float32 向量"""
+        key = (model, normalize_text(text))
+        # 复制一份再冻结：传入的已是 float32 数组时 asarray 不会复制，会把调用方的数组也变成只读
+        array = np.array(vector, dtype=np.float32, copy=True)
+        array.setflags(write=False)
+        created_at = time.time()
+        self._remember(key, created_at, array)
+        if self._db is not None:
+            self._db_put(model, key[1], array, created_at)
+        return array
+
+    def _remember(self, key: Tuple[str, str], created_at: float, vector: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (created_at, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """只清空内存层；持久层按 TTL 失效"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """进程内共享的缓存实例，所有 OllamaClient 共用"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = EmbeddingCache()
+    return _default_cache
@@ -0,0 +1,184 @@
+# backend/llm/embedding_pool.py
+"""
+并发向量化工作池（知识库导入用）
+
+- 文本按批切分后交给固定数量的工作线程，每批调用一次 OllamaClient.get_embeddings
+- 令牌桶限制每秒 HTTP 请求数（含批内拆分重试与逐条回退），避免压垮 Ollama
+- 定期输出进度：已完成条数、吞吐（条/秒）与预计剩余时间
+- 批内失败的条目单独重试（指数退避），重试耗尽才记为失败
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, EMBEDDING_RATE_LIMIT, EMBEDDING_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """令牌桶：平均每秒最多 rate 次请求，允许 burst 次突发；rate <= 0 表示不限速"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ProgressReporter:
+    """线程安全的进度统计，按时间间隔输出日志"""
+
+    def __init__(self, total: int, label: str = "向量化", interval: float = 5.0,
+                 callback: Optional[Callable[[dict], None]] = None):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.callback = callback
+        self.done = 0
+        self.failed = 0
+        self._started = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def advance(self, done: int, failed: int = 0) -> None:
+        with self._lock:
+            self.done += done
+            self.failed += failed
+            now = time.monotonic()
+            finished = self.done + self.failed >= self.total
+            if not finished and now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            snapshot = self.snapshot(now)
+        logger.info(
+            f"[EMBED_POOL] {self.label} {snapshot['done']}/{snapshot['total']}"
+            f"（失败 {snapshot['failed']}），{snapshot['rate']:.1f} 条/秒，预计剩余 {snapshot['eta']:.0f}s"
+        )
+        if self.callback:
+            self.callback(snapshot)
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        elapsed = max((now or time.monotonic()) - self._started, 1e-6)
+        processed = self.done + self.failed
+        rate = processed / elapsed
+        remaining = self.total - processed
+        return {
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "elapsed": elapsed,
+            "rate": rate,
+            "eta": remaining / rate if rate > 0 else 0.0,
+        }
+
+
+class EmbeddingWorkerPool:
+    """
+    用法：
+        pool = EmbeddingWorkerPool(OllamaClient())
+        vectors, errors = pool.embed_all(texts)
+    返回值与 OllamaClient.get_embeddings 相同：向量按输入顺序排列，失败位置为 None。
+    """
+
+    def __init__(
+        self,
+        client,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        rate_limit: float = EMBEDDING_RATE_LIMIT,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        retry_backoff: float = 1.0,
+    ):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.limiter = RateLimiter(rate_limit, burst=self.concurrency)
+
+    def embed_all(self, texts: List[str], progress: Optional[Callable[[dict], None]] = None
+                  ) -> Tuple[List[Optional[np.ndarray]], Dict[int, str]]:
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        errors: Dict[int, str] = {}
+        if not texts:
+            return vectors, errors
+
+        reporter = ProgressReporter(len(texts), callback=progress)
+        batches = [list(range(start, min(start + self.batch_size, len(texts))))
+                   for start in range(0, len(texts), self.batch_size)]
+        logger.info(f"[EMBED_POOL] 开始向量化 {len(texts)} 条文本: {len(batches)} 批, 并发 {self.concurrency}, "
+                    f"限速 {self.limiter.rate if self.limiter.rate > 0 else '不限'} 次/秒")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as executor:
+            futures = {executor.submit(self._run_batch, texts, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = {i: (None, str(e)) for i in batch}
+                failed = 0
+                for i, (vector, error) in results.items():
+                    if vector is not None:
+                        vectors[i] = vector
+                    else:
+                        errors[i] = error or "无法获取嵌入"
+                        failed += 1
+                reporter.advance(len(batch) - failed, failed)
+
+        stats = reporter.snapshot()
+        logger.info(f"[EMBED_POOL] 向量化完成: 成功 {stats['done']}, 失败 {stats['failed']}, "
+                    f"耗时 {stats['elapsed']:.1f}s, {stats['rate']:.1f} 条/秒")
+        return vectors, errors
+
+    def _run_batch(self, texts: List[str], batch: List[int]) -> Dict[int, Tuple[Optional[np.ndarray], Optional[str]]]:
+        """向量化一批文本；批内失败的条目逐条重试"""
+        try:
+            # 限速按 HTTP 请求计：批内的拆分重试与逐条回退每发一次请求都要先取令牌
+            batch_vectors, batch_errors = self.client.get_embeddings([texts[i] for i in batch],
+                                                                     batch_size=len(batch),
+                                                                     before_request=self.limiter.acquire)
+        except Exception as e:
+            batch_vectors, batch_errors = [None] * len(batch), {n: str(e) for n in range(len(batch))}
+
+        results = {}
+        for n, i in enumerate(batch):
+            if batch_vectors[n] is not None:
+                results[i] = (batch_vectors[n], None)
+            else:
+                results[i] = self._retry_item(texts[i], batch_errors.get(n, "无法获取嵌入"))
+        return results
+
+    def _retry_item(self, text: str, error: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        if not text or not text.strip():
+            return None, error
+        for attempt in range(1, self.max_retries + 1):
+            time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            try:
+                return self.client.get_embedding(text, before_request=self.limiter.acquire), None
+            except Exception as e:
+                error = str(e)
+            logger.warning(f"[EMBED_POOL] 第 {attempt}/{self.max_retries} 次重试失败: {error}")
+        return None, error
@@ -0,0 +1,224 @@
+# backend/llm/generation_scheduler.py
+"""
+LLM 生成调用的准入控制与优先级调度
+
+Ollama 同时能并行处理的生成请求有限（OLLAMA_NUM_PARALLEL），超出的请求在 Ollama 内部排队，
+突发流量下所有请求一起变慢，最后一起超时。这里在调用 Ollama 之前先取得一个"生成槽位"：
+- 同时进行的生成数不超过 max_concurrency（与 Ollama 的并行度一致）
+- 槽位用完时进入有界等待队列，按优先级出队（交互式聊天优先于批量/评测流量），同优先级先到先得
+- 队列已满时立即拒绝（429），排队超过 queue_timeout 仍未轮到也拒绝（503），两者都附带建议的 Retry-After
+被接纳的请求延迟可预期；超出能力的请求尽快得到明确答复，而不是等到 120 秒超时。
+同步（线程）与异步（asyncio）调用方共用同一组槽位。
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, List, Optional
+
+from config.settings import GENERATION_CONCURRENCY, GENERATION_QUEUE_SIZE, GENERATION_QUEUE_TIMEOUT
+from runtime.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# 数值越小优先级越高
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+
+class GenerationRejected(RuntimeError):
+    """生成请求未被接纳：status 为建议返回的 HTTP 状态码，retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """排队中的请求：同步调用方等待 threading.Event，异步调用方等待所在事件循环中的 Future"""
+
+    __slots__ = ("priority", "enqueued_at", "granted", "event", "loop", "future")
+
+    def __init__(self, priority: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class GenerationScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = GENERATION_CONCURRENCY,
+        max_queue: int = GENERATION_QUEUE_SIZE,
+        queue_timeout: float = GENERATION_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queue: List[tuple] = []          # 堆：(priority, 序号, _Waiter)
+        self._seq = itertools.count()
+        # 统计
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._waits_ms: Deque[float] = deque(maxlen=500)
+        self._service_s = 10.0                 # 单次生成耗时的指数滑动平均，用于估算 Retry-After
+
+    # ---------- 准入 ----------
+    def _admit(self, priority: int, loop=None) -> Optional[_Waiter]:
+        """立即取得槽位返回 None；需要排队返回 _Waiter；队列已满抛出 GenerationRejected（调用方持有锁）"""
+        if self._running < self.max_concurrency and not self._queue:
+            self._running += 1
+            self.admitted += 1
+            self._waits_ms.append(0.0)
+            return None
+        if len(self._queue) >= self.max_queue:
+            self.rejected_full += 1
+            retry_after = self._retry_after_locked()
+            logger.warning(f"[GEN_SCHED] 等待队列已满（{len(self._queue)}），拒绝请求，Retry-After {retry_after}s")
+            raise GenerationRejected("生成队列已满，请稍后重试", 429, retry_after)
+        waiter = _Waiter(priority, loop)
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        return waiter
+
+    def _granted(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self.admitted += 1
+            self._waits_ms.append((time.monotonic() - waiter.enqueued_at) * 1000)
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """等待超时或被取消：仍在队列中则移除并返回 True；已被授予槽位返回 False（调用方须照常使用并释放）"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queue = [item for item in self._queue if item[2] is not waiter]
+            heapq.heapify(self._queue)
+            return True
+
+    def _wait_limit(self, timeout: Optional[float]) -> Optional[float]:
+        """排队最多等待多久：队列超时与调用方剩余时间中较小者，None 表示不限"""
+        limits = [t for t in (self.queue_timeout if self.queue_timeout > 0 else None, timeout) if t is not None]
+        return min(limits) if limits else None
+
+    def _timeout_rejection(self, timeout: Optional[float]) -> Exception:
+        if timeout is not None and (self.queue_timeout <= 0 or timeout < self.queue_timeout):
+            # 先耗尽的是调用方的请求预算，而不是队列超时：交给调用方降级处理
+            return DeadlineExceeded(f"排队 {timeout:.1f}s 未取得生成槽位")
+        with self._lock:
+            self.rejected_timeout += 1
+            retry_after = self._retry_after_locked()
+        logger.warning(f"[GEN_SCHED] 排队超过 {self.queue_timeout}s，拒绝请求，Retry-After {retry_after}s")
+        return GenerationRejected("生成服务繁忙，请稍后重试", 503, retry_after)
+
+    def _release(self, service_s: Optional[float] = None) -> None:
+        """
+        归还槽位：队列非空时直接转交给优先级最高的等待者。
+        service_s 为本次占用时长，计入平均服务时间（用于估算 Retry-After）；None 表示不计入（槽位并未真正用于生成）
+        """
+        with self._lock:
+            if service_s is not None:
+                self._service_s = 0.8 * self._service_s + 0.2 * service_s
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._running -= 1
+
+    def _retry_after_locked(self) -> int:
+        """排在队尾的请求大约还要等多少秒"""
+        rounds = (len(self._queue) + 1) / self.max_concurrency
+        return max(1, math.ceil(rounds * self._service_s))
+
+    # ---------- 对外接口 ----------
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None, measure: bool = True):
+        """
+        同步取得一个生成槽位，with 块结束时归还。
+        timeout 为调用方剩余的请求预算：在此之前仍未轮到时抛出 DeadlineExceeded。
+        measure=False 时占用时长不计入平均服务时间（如模型预热，耗时主要是加载模型）。
+        """
+        with self._lock:
+            waiter = self._admit(priority)
+        if waiter is not None:
+            waiter.event.wait(self._wait_limit(timeout))
+            if not waiter.granted and self._abandon(waiter):
+                raise self._timeout_rejection(timeout)
+            self._granted(waiter)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started if measure else None)
+
+    @asynccontextmanager
+    async def async_slot(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """slot 的异步版本：排队时 await，不占用事件循环"""
+        with self._lock:
+            waiter = self._admit(priority, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self._wait_limit(timeout))
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise self._timeout_rejection(timeout)
+            except asyncio.CancelledError:
+                # 调用方被取消：若槽位恰好已转交过来，必须归还
+                if not self._abandon(waiter):
+                    self._release()
+                raise
+            self._granted(waiter)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            by_priority: Dict[str, int] = {}
+            for priority, _, _ in self._queue:
+                name = _PRIORITY_NAMES.get(priority, str(priority))
+                by_priority[name] = by_priority.get(name, 0) + 1
+            return {
+                "running": self._running,
+                "max_concurrency": self.max_concurrency,
+                "queue_depth": len(self._queue),
+                "queue_by_priority": by_priority,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected_full": self.rejected_full,
+                "rejected_timeout": self.rejected_timeout,
+                "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0.0,
+                "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+                "service_s_avg": round(self._service_s, 2),
+            }
+
+
+# 进程内唯一实例：同步与异步客户端共用
+generation_scheduler = GenerationScheduler()
@@ -2,8 +2,18 @@
 
 import requests
 import json
+import time
+import numpy as np
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 # 使用相对导入来引用同父级或更高父级目录的模块
-from config.settings import OLLAMA_API_URL, LLM_MODEL_NAME, EMBEDDING_MODEL_NAME
+from config.settings import (
+    OLLAMA_API_URL, LLM_MODEL_NAME, EMBEDDING_MODEL_NAME, OLLAMA_KEEP_ALIVE,
+    OLLAMA_CONNECT_TIMEOUT, OLLAMA_EMBED_TIMEOUT, OLLAMA_GENERATE_TIMEOUT,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_CHARS,
+)
+from runtime.http import get_session, get_async_client
+from llm.embedding_cache import get_embedding_cache
+from llm.generation_scheduler import generation_scheduler, PRIORITY_INTERACTIVE
 
 
 class OllamaClient:
@@ -13,31 +23,251 @@ class OllamaClient:
         self.api_url = OLLAMA_API_URL
         self.llm_model = LLM_MODEL_NAME
         self.embed_model = EMBEDDING_MODEL_NAME
+        # 查询向量缓存（进程内共享），重复问题与重试不再请求 Ollama
+        self.embedding_cache = get_embedding_cache()
+        # 共享的 keep-alive 连接池，避免每次调用重新建立 TCP 连接
+        self.session = get_session("ollama")
         print(f"[OLLAMA_CLIENT] Initialized. LLM: {self.llm_model}, Embed: {self.embed_model}")
 
-    def get_embedding(self, text: str) -> list:
-        """调用 Ollama 的 /api/embeddings 接口获取文本向量。"""
+    def get_embedding(self, text: str, timeout: Optional[float] = None,
+                      before_request: Optional[Callable[[], None]] = None) -> np.ndarray:
+        """
+        调用 Ollama 的 /api/embeddings 接口获取文本向量（优先读取缓存）。
+        返回只读的 float32 数组，可直接交给 vector_repo 检索，无需再转换为 Python 列表。
+        before_request：真正发出 HTTP 请求前调用（如限速器的 acquire），命中缓存时不调用。
+        """
+        cached = self.embedding_cache.get(self.embed_model, text)
+        if cached is not None:
+            return cached
+
         url = f"{self.api_url}/api/embeddings"
-        payload = {"model": self.embed_model, "prompt": text}
+        payload = {"model": self.embed_model, "prompt": text, "keep_alive": OLLAMA_KEEP_ALIVE}
 
+        if before_request is not None:
+            before_request()
         try:
-            response = requests.post(url, json=payload, timeout=60)
+            response = self.session.post(url, json=payload, timeout=_timeouts(OLLAMA_EMBED_TIMEOUT, timeout))
             response.raise_for_status()
-            return response.json()['embedding']
+            embedding = response.json()['embedding']
+            if not embedding:
+                raise ValueError("[OLLAMA_CLIENT] Embedding API 返回空向量")
+            return self.embedding_cache.put(self.embed_model, text, embedding)
         except requests.exceptions.RequestException as e:
             # 给出更详细的错误信息，帮助调试
             raise ConnectionError(f"[OLLAMA_CLIENT] Embedding API 连接失败，请确认 Ollama 已启动并模型已加载: {e}")
 
-    def generate_response(self, prompt: str) -> str:
-        """调用 Ollama 的 /api/generate 接口生成回答。"""
-        url = f"{self.api_url}/api/generate"
-        payload = {"model": self.llm_model, "prompt": prompt, "stream": False}
+    def get_embeddings(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                       before_request: Optional[Callable[[], None]] = None
+                       ) -> Tuple[List[Optional[np.ndarray]], Dict[int, str]]:
+        """
+        批量获取文本向量：调用 /api/embed 的多输入接口，一次请求向量化一批文本。
+        返回 (向量列表, 错误信息)：向量（float32 数组）与输入一一对应，失败的位置为 None，
+        错误信息为 {输入下标: 原因}。
+        - 已缓存的文本不再请求
+        - 每批不超过 batch_size 条、EMBEDDING_BATCH_MAX_CHARS 个字符
+        - 整批失败时对半拆分重试，最终定位到具体失败的单条
+        before_request 在每次 HTTP 请求（含拆分重试与逐条回退）前调用，供调用方按请求限速。
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        errors: Dict[int, str] = {}
+
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                errors[i] = "空文本"
+                continue
+            cached = self.embedding_cache.get(self.embed_model, text)
+            if cached is not None:
+                vectors[i] = cached
+            else:
+                pending.append(i)
+
+        for batch in self._split_batches(texts, pending, max(1, batch_size)):
+            self._embed_batch(texts, batch, vectors, errors, before_request)
+        return vectors, errors
 
+    @staticmethod
+    def _split_batches(texts: List[str], indices: List[int], batch_size: int) -> List[List[int]]:
+        batches, current, chars = [], [], 0
+        for i in indices:
+            size = len(texts[i])
+            if current and (len(current) >= batch_size or chars + size > EMBEDDING_BATCH_MAX_CHARS):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(i)
+            chars += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, texts: List[str], batch: List[int], vectors: List[Optional[np.ndarray]],
+                     errors: Dict[int, str], before_request: Optional[Callable[[], None]] = None) -> None:
+        url = f"{self.api_url}/api/embed"
+        payload = {"model": self.embed_model, "input": [texts[i] for i in batch], "keep_alive": OLLAMA_KEEP_ALIVE}
+        if before_request is not None:
+            before_request()
         try:
-            response = requests.post(url, json=payload, timeout=120)
+            response = self.session.post(url, json=payload, timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_EMBED_TIMEOUT))
+            if response.status_code == 404 and 'model' not in response.text.lower():
+                # 旧版 Ollama 没有 /api/embed（模型不存在时错误信息会提到 model），逐条调用 /api/embeddings
+                self._embed_one_by_one(texts, batch, vectors, errors, before_request)
+                return
             response.raise_for_status()
-            if 'response' in response.json():
-                return response.json()['response']
-            return str(response.json())  # 返回原始 JSON 字符串
+            embeddings = response.json().get('embeddings') or []
+            if len(embeddings) != len(batch):
+                raise ValueError(f"返回 {len(embeddings)} 个向量，期望 {len(batch)} 个")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if len(batch) > 1:
+                # 可能是个别超长文本或整批超出上下文，拆分后重试
+                mid = len(batch) // 2
+                self._embed_batch(texts, batch[:mid], vectors, errors, before_request)
+                self._embed_batch(texts, batch[mid:], vectors, errors, before_request)
+            else:
+                errors[batch[0]] = str(e)
+            return
+
+        for i, embedding in zip(batch, embeddings):
+            if embedding:
+                vectors[i] = self.embedding_cache.put(self.embed_model, texts[i], embedding)
+            else:
+                errors[i] = "返回空向量"
+
+    def _embed_one_by_one(self, texts: List[str], batch: List[int], vectors: List[Optional[np.ndarray]],
+                          errors: Dict[int, str], before_request: Optional[Callable[[], None]] = None) -> None:
+        for i in batch:
+            try:
+                vectors[i] = self.get_embedding(texts[i], before_request=before_request)
+            except Exception as e:
+                errors[i] = str(e)
+
+    def generate_response(self, prompt: str, system: Optional[str] = None,
+                          priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> str:
+        """
+        调用 Ollama 的 /api/chat 接口生成回答。
+        system 为固定的系统提示词：每次请求的开头完全相同，模型常驻期间 Ollama 复用这部分已计算的 KV 缓存，
+        只需对 prompt（上下文与问题）做 prefill。
+        调用前先从 generation_scheduler 取得生成槽位，未被接纳时抛出 GenerationRejected。
+        timeout 为调用方剩余的请求预算（秒），同时限制排队与生成，缺省时按 OLLAMA_GENERATE_TIMEOUT。
+        """
+        url = f"{self.api_url}/api/chat"
+        payload = _chat_payload(self.llm_model, prompt, system, stream=False)
+
+        try:
+            started = time.monotonic()
+            with generation_scheduler.slot(priority, timeout):
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                response = self.session.post(url, json=payload, timeout=_timeouts(OLLAMA_GENERATE_TIMEOUT, remaining))
+            response.raise_for_status()
+            return _extract_response(response.json())
         except requests.exceptions.RequestException as e:
             raise ConnectionError(f"[OLLAMA_CLIENT] Generate API 连接失败: {e}")
+
+    def generate_stream(self, prompt: str, system: Optional[str] = None,
+                        priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        以流式模式调用 /api/chat，逐段产出生成的文本。
+        Ollama 每行返回一个 JSON 对象，done 为 true 时结束；读取超时作用于相邻两段之间。
+        生成槽位在整个流式输出期间保持占用。timeout 限制排队与相邻两段之间的等待；
+        整体时长由调用方按请求预算在迭代中自行截止。
+        """
+        url = f"{self.api_url}/api/chat"
+        payload = _chat_payload(self.llm_model, prompt, system, stream=True)
+
+        try:
+            with generation_scheduler.slot(priority, timeout), \
+                    self.session.post(url, json=payload, stream=True,
+                                      timeout=_timeouts(OLLAMA_GENERATE_TIMEOUT, timeout)) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise ConnectionError(f"[OLLAMA_CLIENT] Generate API 返回错误: {chunk['error']}")
+                    text = (chunk.get('message') or {}).get('content') or chunk.get('response')
+                    if text:
+                        yield text
+                    if chunk.get('done'):
+                        break
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"[OLLAMA_CLIENT] Generate API 连接失败: {e}")
+
+
+def _timeouts(read_cap: float, timeout: Optional[float]) -> Tuple[float, float]:
+    """(连接超时, 读超时)：传入 timeout（剩余预算）时两者都不超过它"""
+    if timeout is None:
+        return OLLAMA_CONNECT_TIMEOUT, read_cap
+    timeout = max(timeout, 0.05)
+    return min(OLLAMA_CONNECT_TIMEOUT, timeout), min(read_cap, timeout)
+
+
+def _chat_payload(model: str, prompt: str, system: Optional[str], stream: bool) -> dict:
+    messages = [{"role": "user", "content": prompt}]
+    if system:
+        messages.insert(0, {"role": "system", "content": system})
+    return {"model": model, "messages": messages, "stream": stream, "keep_alive": OLLAMA_KEEP_ALIVE}
+
+
+def _extract_response(body: dict) -> str:
+    if 'message' in body:
+        return (body['message'] or {}).get('content', '')
+    if 'response' in body:
+        return body['response']
+    return str(body)  # 返回原始 JSON 字符串
+
+
+class AsyncOllamaClient:
+    """
+    OllamaClient 的异步版本（基于 httpx），用于 async_app：
+    等待 Ollama 生成期间不占用工作线程。与同步客户端共享 Embedding 缓存。
+    """
+
+    def __init__(self):
+        self.api_url = OLLAMA_API_URL
+        self.llm_model = LLM_MODEL_NAME
+        self.embed_model = EMBEDDING_MODEL_NAME
+        self.embedding_cache = get_embedding_cache()
+
+    @staticmethod
+    def _timeout(read_cap: float, timeout: Optional[float] = None):
+        import httpx
+        connect, read = _timeouts(read_cap, timeout)
+        return httpx.Timeout(read, connect=connect)
+
+    async def get_embedding(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """异步调用 /api/embeddings 获取文本向量（优先读取缓存），返回 float32 数组。"""
+        import httpx
+
+        cached = self.embedding_cache.get(self.embed_model, text)
+        if cached is not None:
+            return cached
+
+        url = f"{self.api_url}/api/embeddings"
+        payload = {"model": self.embed_model, "prompt": text, "keep_alive": OLLAMA_KEEP_ALIVE}
+        try:
+            response = await get_async_client("ollama").post(url, json=payload, timeout=self._timeout(OLLAMA_EMBED_TIMEOUT, timeout))
+            response.raise_for_status()
+            embedding = response.json()['embedding']
+            if not embedding:
+                raise ValueError("[OLLAMA_CLIENT] Embedding API 返回空向量")
+            return self.embedding_cache.put(self.embed_model, text, embedding)
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"[OLLAMA_CLIENT] Embedding API 连接失败，请确认 Ollama 已启动并模型已加载: {e}")
+
+    async def generate_response(self, prompt: str, system: Optional[str] = None,
+                                priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> str:
+        """异步调用 /api/chat 生成回答，参数含义同 OllamaClient.generate_response。"""
+        import httpx
+
+        url = f"{self.api_url}/api/chat"
+        payload = _chat_payload(self.llm_model, prompt, system, stream=False)
+        try:
+            started = time.monotonic()
+            async with generation_scheduler.async_slot(priority, timeout):
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                response = await get_async_client("ollama").post(
+                    url, json=payload, timeout=self._timeout(OLLAMA_GENERATE_TIMEOUT, remaining))
+            response.raise_for_status()
+            return _extract_response(response.json())
+        except httpx.HTTPError as e:
+            raise ConnectionError(f"[OLLAMA_CLIENT] Generate API 连接失败: {e}")
@@ -0,0 +1,185 @@
+# backend/rag/answer_cache.py
+"""
+语义答案缓存
+
+以查询向量为键缓存 RAG 生成的答案：新问题与某条已缓存问题的余弦相似度达到阈值时，
+直接返回缓存的答案与来源，不再调用 LLM。
+没有查询向量时（Weaviate 自动向量化模式、或时间预算不足跳过了向量化）按规范化后的问题文本精确匹配，
+同一条目同时可按文本与向量命中。
+- 容量有限，满了淘汰最久未命中的条目
+- 条目带 TTL
+- 知识库版本变化（重新导入）时整体失效
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from config.settings import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD
+from rag.single_flight import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """向量按槽位存放在预分配的 float32 矩阵中，查询为一次矩阵-向量乘法"""
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        version_source: Optional[Callable[[], str]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._version_source = version_source
+        self._version = version_source() if version_source else ""
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None        # (max_entries, dim)
+        self._valid = np.zeros(max(max_entries, 0), dtype=bool)
+        self._has_vector = np.zeros(max(max_entries, 0), dtype=bool)
+        self._by_text: Dict[str, int] = {}                # 规范化问题文本 -> 槽位
+        self._last_used = np.zeros(max(max_entries, 0), dtype=np.float64)
+        self._created_at = np.zeros(max(max_entries, 0), dtype=np.float64)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * max(max_entries, 0)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _check_version(self) -> None:
+        """知识库版本变化时清空缓存（调用方持有锁）"""
+        if self._version_source is None:
+            return
+        version = self._version_source()
+        if version != self._version:
+            if self._valid.any():
+                logger.info("[ANSWER_CACHE] 知识库版本变化，清空答案缓存")
+            self._clear_locked()
+            self._version = version
+
+    def _clear_locked(self) -> None:
+        self._valid[:] = False
+        self._entries = [None] * self.max_entries
+        self._by_text.clear()
+        self.invalidations += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear_locked()
+
+    def lookup(self, query_vector, query_text: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        先按规范化后的问题文本精确匹配，再按查询向量做相似度匹配（query_vector 为 None 时只做前者）。
+        返回 {"answer", "sources", "query", "similarity"}，未命中返回 None
+        """
+        if not self.enabled or (query_vector is None and not query_text):
+            return None
+        query = self._normalize(query_vector) if query_vector is not None else None
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            if self.ttl > 0:
+                self._valid &= (now - self._created_at) <= self.ttl
+            slot, similarity = self._match_text_locked(query_text)
+            if slot is None and query is not None:
+                slot, similarity = self._match_vector_locked(query)
+            if slot is None:
+                self.misses += 1
+                return None
+            self._last_used[slot] = now
+            self.hits += 1
+            entry = self._entries[slot]
+            return {
+                "answer": entry["answer"],
+                "sources": list(entry["sources"]),
+                "query": entry["query"],
+                "similarity": similarity,
+            }
+
+    def _match_text_locked(self, query_text: Optional[str]):
+        slot = self._by_text.get(normalize_question(query_text)) if query_text else None
+        if slot is None or not self._valid[slot]:
+            return None, 0.0
+        return slot, 1.0
+
+    def _match_vector_locked(self, query: np.ndarray):
+        searchable = self._valid & self._has_vector
+        if self._vectors is None or not searchable.any() or query.shape[0] != self._vectors.shape[1]:
+            return None, 0.0
+        scores = self._vectors @ query
+        scores[~searchable] = -np.inf
+        slot = int(np.argmax(scores))
+        similarity = float(scores[slot])
+        if similarity < self.threshold:
+            return None, 0.0
+        return slot, similarity
+
+    def store(self, query: str, query_vector, answer: str, sources: List[str]) -> None:
+        """写入一条答案；query_vector 为 None 时只能按问题文本命中"""
+        if not self.enabled:
+            return
+        vector = self._normalize(query_vector) if query_vector is not None else None
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            if vector is not None and (self._vectors is None or self._vectors.shape[1] != vector.shape[0]):
+                # 首次写入向量或向量维度变化（换了 Embedding 模型）时重新分配
+                if self._vectors is not None:
+                    self._valid[:] = False
+                    self._entries = [None] * self.max_entries
+                    self._by_text.clear()
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._has_vector[:] = False
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+            previous = self._entries[slot]
+            if previous is not None and self._by_text.get(previous["key"]) == slot:
+                del self._by_text[previous["key"]]
+            key = normalize_question(query)
+            old_slot = self._by_text.get(key)
+            if old_slot is not None and old_slot != slot:
+                # 同一问题再次写入：旧条目作废
+                self._valid[old_slot] = False
+            self._by_text[key] = slot
+            self._has_vector[slot] = vector is not None
+            if vector is not None:
+                self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._last_used[slot] = now
+            self._created_at[slot] = now
+            self._entries[slot] = {
+                "key": key,
+                "query": query,
+                "answer": answer,
+                "sources": list(sources),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._valid.sum()),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "threshold": self.threshold,
+            }
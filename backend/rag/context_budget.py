@@ -0,0 +1,102 @@
+# backend/rag/context_budget.py
+"""
+上下文预算
+
+检索结果拼入 Prompt 之前先筛一遍：Prompt 越长，Ollama 的 prefill 越慢，CPU 部署时这部分占了大头。
+- 去重：与已选段落字符二元组重合度（Jaccard）达到阈值的近似重复段落丢弃
+- 分差截断：相邻两条的得分落差超过最高分的一定比例时，其后的段落都不再采用
+- Token 预算：按顺序累加估算的 token 数，超出预算即停止；第一条单独超出时截断其答案
+得分只做相对比较，BM25、余弦相似度与排名融合得分都适用。
+"""
+import logging
+import math
+import re
+from typing import Any, Dict, List, Sequence
+
+from config.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUPE_THRESHOLD, CONTEXT_SCORE_GAP
+from workflow.scoring import tokenize
+
+logger = logging.getLogger(__name__)
+
+_CJK_CHAR = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 qwen 系列分词后的 token 数：中文及全角字符约 1 字 1 token，其余约 4 字符 1 token"""
+    text = text or ""
+    cjk = len(_CJK_CHAR.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def format_context(hit: Dict[str, Any]) -> str:
+    """单条检索结果拼成 Prompt 中的一段：来源、问题、答案各占一行"""
+    lines = [hit.get(field) for field in ("source", "question", "answer")]
+    return "\n".join(line for line in lines if line)
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextBudgeter:
+    def __init__(
+        self,
+        max_tokens: int = CONTEXT_TOKEN_BUDGET,
+        dedupe_threshold: float = CONTEXT_DEDUPE_THRESHOLD,
+        score_gap: float = CONTEXT_SCORE_GAP,
+    ):
+        self.max_tokens = max_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.score_gap = score_gap
+
+    def select(self, hits: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """hits 按相关度降序（含 answer 与可选的 score），返回可直接拼入 Prompt 的子集"""
+        hits = [h for h in hits if h.get("answer")]
+        if not hits:
+            return []
+
+        selected: List[Dict[str, Any]] = []
+        seen: List[set] = []
+        used = 0
+        top_score = hits[0].get("score")
+        prev_score = top_score
+        for hit in hits:
+            score = hit.get("score")
+            if selected and self.score_gap > 0 and top_score and score is not None and prev_score is not None:
+                if (prev_score - score) / abs(top_score) > self.score_gap:
+                    logger.debug(f"[CONTEXT] 得分落差过大，截断于 {len(selected)} 条")
+                    break
+            prev_score = score
+
+            grams = set(tokenize(f"{hit.get('question') or ''} {hit['answer']}"))
+            if any(_similarity(grams, other) >= self.dedupe_threshold for other in seen):
+                continue
+
+            cost = estimate_tokens(format_context(hit))
+            if self.max_tokens > 0 and used + cost > self.max_tokens:
+                if not selected:
+                    selected.append(self._truncate(hit, self.max_tokens))
+                break
+            selected.append(hit)
+            seen.append(grams)
+            used += cost
+
+        if len(selected) < len(hits):
+            logger.info(f"[CONTEXT] 检索 {len(hits)} 条，采用 {len(selected)} 条")
+        return selected
+
+    @staticmethod
+    def _truncate(hit: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+        """按估算的 token 数截断答案正文，保留来源与问题"""
+        overhead = estimate_tokens(format_context(dict(hit, answer="")))
+        remaining = max(max_tokens - overhead, 0)
+        answer, kept, used = hit["answer"], [], 0
+        for ch in answer:
+            cost = 1 if _CJK_CHAR.match(ch) else 0.25
+            if used + cost > remaining:
+                break
+            kept.append(ch)
+            used += cost
+        return dict(hit, answer="".join(kept) + ("…" if len(kept) < len(answer) else ""))
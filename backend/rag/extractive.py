@@ -0,0 +1,57 @@
+# backend/rag/extractive.py
+"""
+抽取式直答
+
+知识库是整理好的问/答对，用户的问题与某条知识的问题几乎相同时，让 LLM 把现成答案再转述一遍只是多花几秒。
+这里对检索结果逐条计算用户问题与知识问题的相似度（字符二元组 Dice 系数）：
+- 最佳候选的相似度达到阈值
+- 且领先次佳候选（答案不同的候选，同一答案的重复条目不算竞争者）至少一个差值
+两者都满足时直接返回该条知识的答案原文，不调用 LLM。
+检索得分在 BM25、向量、混合检索下含义各不相同，且知识向量由问题与答案一起生成，
+因此不用检索得分，而是单独比较问题文本，判断标准与检索方式无关。
+"""
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional, Sequence
+
+from config.settings import EXTRACTIVE_ANSWER_ENABLED, EXTRACTIVE_THRESHOLD, EXTRACTIVE_MARGIN
+from workflow.scoring import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def question_similarity(a: str, b: str) -> float:
+    """两个问题的字符二元组 Dice 系数：2|A∩B| / (|A| + |B|)，按多重集计数，忽略标点与大小写"""
+    grams_a, grams_b = Counter(tokenize(a)), Counter(tokenize(b))
+    total = sum(grams_a.values()) + sum(grams_b.values())
+    if not total:
+        return 0.0
+    return 2 * sum((grams_a & grams_b).values()) / total
+
+
+class ExtractiveMatcher:
+    def __init__(self, threshold: float = EXTRACTIVE_THRESHOLD, margin: float = EXTRACTIVE_MARGIN,
+                 enabled: bool = EXTRACTIVE_ANSWER_ENABLED):
+        self.threshold = threshold
+        self.margin = margin
+        self.enabled = enabled
+
+    def match(self, user_input: str, hits: Sequence[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        hits 为检索结果（含 question 与 answer）。可以直答时返回 dict(最佳候选, similarity, runner_up)，否则返回 None。
+        """
+        if not self.enabled:
+            return None
+        scored = sorted(
+            ((question_similarity(user_input, h.get("question") or ""), h) for h in hits if h.get("answer")),
+            key=lambda item: item[0], reverse=True,
+        )
+        if not scored:
+            return None
+
+        best_similarity, best = scored[0]
+        runner_up = next((s for s, h in scored[1:] if h["answer"].strip() != best["answer"].strip()), 0.0)
+        if best_similarity < self.threshold or best_similarity - runner_up < self.margin:
+            logger.debug(f"[EXTRACTIVE] 不直答：最佳 {best_similarity:.3f}，次佳 {runner_up:.3f}")
+            return None
+        return dict(best, similarity=round(best_similarity, 3), runner_up=round(runner_up, 3))
@@ -1,15 +1,28 @@
 import os
 import sys
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 # === 修正 Python 模块路径（容器内以 /app 运行） ===
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # === 统一使用绝对导入（不要再有 .. 相对导入） ===
-from llm.ollama_client import OllamaClient
-from db.vector_repo import retrieve_context, get_knowledge_count
-from config.settings import LLM_MODEL_NAME, WEAVIATE_AUTO_VECTORIZE  # 若未使用也保留以便配置集中
+from llm.ollama_client import OllamaClient, AsyncOllamaClient
+from llm.generation_scheduler import GenerationRejected, PRIORITY_INTERACTIVE
+from db.vector_repo import (
+    retrieve_hits, get_knowledge_count, get_knowledge_version,
+    retrieve_hits_async, get_knowledge_count_async,
+)
+from rag.answer_cache import SemanticAnswerCache
+from rag.context_budget import ContextBudgeter, format_context
+from rag.extractive import ExtractiveMatcher
+from rag.knowledge_state import KnowledgeCountCache
+from rag.single_flight import SingleFlight, SharedStreams, normalize_question
+from runtime.deadline import Deadline
+from config.settings import (  # 若未使用也保留以便配置集中
+    LLM_MODEL_NAME, WEAVIATE_AUTO_VECTORIZE, RETRIEVAL_TOP_K, RAG_SINGLE_FLIGHT,
+    DEADLINE_EMBED_TIMEOUT, DEADLINE_GENERATE_RESERVE,
+)
 
 # === 配置日志 ===
 logging.basicConfig(
@@ -18,6 +31,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 固定的系统提示词：作为 system 消息放在每次请求的最前面，内容不随问题变化，
+# 模型常驻时 Ollama 只需对其做一次 prefill，之后的请求直接复用这部分 KV 缓存。
+# 修改这里会使已有的前缀缓存失效，不要在其中拼入任何随请求变化的内容。
+RAG_SYSTEM_PROMPT = """你是一个专业的 AI 助手。请遵守以下规则：
+- 如果用户只是打招呼或寒暄（如“你好”、“您好”、“hi”），只回复“你好，有什么可以帮助你的吗？”
+- 不要复述历史；避免引用会话记忆。
+- 仅在用户提出明确问题或任务时，基于上下文提供答案。
+- 没有提供上下文信息时，基于你的知识回答。"""
+
+# 时间预算耗尽且没有可直接返回的问答原文时的答复
+DEGRADED_NO_CONTEXT_ANSWER = "抱歉，当前请求较多，未能在限定时间内生成答案，请稍后重试。"
+
 
 class RAGHandler:
     """
@@ -27,33 +52,35 @@ class RAGHandler:
 
     def __init__(self):
         self.ollama_client = OllamaClient()
+        self._async_client: Optional[AsyncOllamaClient] = None
+        # 语义答案缓存：相似问题直接复用已生成的答案，知识库重新导入后自动失效
+        self.answer_cache = SemanticAnswerCache(version_source=get_knowledge_version)
+        # 知识库记录数缓存：热路径不再每次发起 Aggregate 查询
+        self.knowledge_count = KnowledgeCountCache(get_knowledge_count, version_source=get_knowledge_version)
+        # 检索结果拼入 Prompt 前去重、按分差截断并控制在 token 预算内
+        self.context_budget = ContextBudgeter()
+        # 用户问题与某条知识的问题几乎相同时直接返回该条答案，不调用 LLM
+        self.extractive = ExtractiveMatcher()
+        # 相同问题的并发请求合并为一次计算（流式请求共享同一条事件流）
+        self.in_flight = SingleFlight()
+        self.shared_streams = SharedStreams()
         logger.info("[RAG_HANDLER] RAG 处理器已初始化.")
 
-    def _check_knowledge_base(self) -> bool:
+    def _knowledge_base_ready(self, count: int) -> bool:
         """检查知识库是否有数据"""
-        try:
-            count = get_knowledge_count()
-            if count > 0:
-                logger.info(f"知识库检查通过, 共 {count} 条记录.")
-                return True
-            logger.warning("知识库检查失败: Weaviate 中记录为 0.")
-            return False
-        except Exception as e:
-            logger.error(f"检查知识库时出错: {e}")
-            return False
+        if count > 0:
+            logger.debug(f"知识库检查通过, 共 {count} 条记录.")
+            return True
+        logger.warning("知识库检查失败: Weaviate 中记录为 0.")
+        return False
 
     def _build_prompt(self, user_input: str, contexts: List[str]) -> str:
-        """构建最终 Prompt"""
+        """构建 Prompt 的可变部分（用户消息），固定规则在 RAG_SYSTEM_PROMPT 中"""
         if not contexts:
             return f"请基于你的知识回答以下问题: {user_input}"
 
         context_str = "\n\n".join(contexts)
         prompt = f"""
-你是一个专业的 AI 助手。请遵守以下规则：
-- 如果用户只是打招呼或寒暄（如“你好”、“您好”、“hi”），只回复“你好，有什么可以帮助你的吗？”
-- 不要复述历史；避免引用会话记忆。
-- 仅在用户提出明确问题或任务时，基于上下文提供答案。
-
 【上下文信息】:
 {context_str}
 
@@ -64,47 +91,305 @@ class RAGHandler:
 """
         return prompt.strip()
 
-    def answer_question(self, user_input: str) -> Dict[str, Any]:
-        """主流程：检索 + 生成"""
+    @staticmethod
+    def _sources(hits: List[Dict[str, Any]]) -> List[str]:
+        return [h.get("source") or h.get("question") or h["answer"].split('\n')[0] for h in hits]
+
+    def _degraded(self, hits: List[Dict[str, Any]], reason: str) -> Dict[str, Any]:
+        """不调用（或放弃）LLM：直接返回最相关的一条问答原文"""
+        logger.warning(f"[RAG_HANDLER] {reason}，返回最相关的问答原文。")
+        if not hits:
+            return {"answer": DEGRADED_NO_CONTEXT_ANSWER, "sources": [], "degraded": True}
+        return {"answer": hits[0]["answer"], "sources": self._sources(hits[:1]), "degraded": True}
+
+    def _prepare(self, user_input: str, query_vector: Optional[List[float]], deadline: Deadline):
+        """
+        生成之前的流程（不直接做 I/O）：
+        每个需要外部调用的步骤都 yield 一个 (操作, 参数) 交给驱动方执行，结果经 send 传回，
+        异常经 throw 抛回；同步、异步与流式入口共用同一套流程逻辑。
+        deadline 为请求级时间预算：驱动方据此限制每一步的超时，这里据此决定是否降级。
+        返回 {"result": 最终结果}（无需调用 LLM）或 {"prompt", "sources", "hits", "query_vector"}。
+        """
         t = (user_input or "").strip().lower()
         if any(g in t for g in ["你好", "您好", "hi", "hello", "hey", "嗨", "在吗"]):
-            return {"answer": "你好，有什么可以帮助你的吗？", "sources": []}
+            return {"result": {"answer": "你好，有什么可以帮助你的吗？", "sources": []}}
+
+        # 1. 问题向量化（自动向量化模式下由 Weaviate 完成）；预算不足时跳过，直接用 BM25 检索
+        if not WEAVIATE_AUTO_VECTORIZE and query_vector is None:
+            if not deadline.has(DEADLINE_EMBED_TIMEOUT + DEADLINE_GENERATE_RESERVE):
+                logger.warning("[RAG_HANDLER] 剩余时间预算不足，跳过向量化，改用关键词检索。")
+            else:
+                try:
+                    query_vector = yield ("embed", user_input)
+                    logger.info("[RAG_HANDLER] 用户问题向量化成功。")
+                except Exception as e:
+                    logger.warning(f"[RAG_HANDLER] 用户问题向量化失败，改用关键词检索: {e}")
 
-        # 1. 检查知识库
-        if not self._check_knowledge_base():
+        # 2. 语义答案缓存：命中则跳过检索与生成
+        cached = self.answer_cache.lookup(query_vector, user_input)
+        if cached is not None:
+            logger.info(f"[RAG_HANDLER] 命中答案缓存 (相似度 {cached['similarity']:.3f})。")
+            return {"result": {"answer": cached["answer"], "sources": cached["sources"], "cached": True}}
+
+        # 3. 检查知识库（优先使用缓存的记录数）
+        count = self.knowledge_count.peek()
+        if count is None:
+            try:
+                count = yield ("count", None)
+                self.knowledge_count.set(count)
+            except Exception as e:
+                logger.error(f"检查知识库时出错: {e}")
+                count = 0
+        ready = self._knowledge_base_ready(count)
+        if not ready:
             logger.warning("[RAG_HANDLER] 知识库为空，终止流程。")
-            return {
+            return {"result": {
                 "answer": "抱歉，知识库尚未导入。请先导入知识库文件。",
                 "sources": []
-            }
+            }}
 
         try:
-            if WEAVIATE_AUTO_VECTORIZE:
-                contexts = retrieve_context(user_input)
+            # 同时带上问题原文：开启混合检索时与向量一起做 BM25 + 向量融合检索
+            if WEAVIATE_AUTO_VECTORIZE or query_vector is None:
+                hits = yield ("retrieve", (user_input, user_input))
             else:
-                query_vector = self.ollama_client.get_embedding(user_input)
-                logger.info("[RAG_HANDLER] 用户问题向量化成功。")
-                contexts = retrieve_context(query_vector)
-            logger.info(f"[RAG_HANDLER] 检索到 {len(contexts)} 条上下文。")
-        except Exception as e:
+                hits = yield ("retrieve", (query_vector, user_input))
+            logger.info(f"[RAG_HANDLER] 检索到 {len(hits)} 条上下文。")
+        except Exception:
             try:
-                contexts = retrieve_context(user_input)
-                logger.info(f"[RAG_HANDLER] 检索到 {len(contexts)} 条上下文。")
+                hits = yield ("retrieve", (user_input, user_input))
+                logger.info(f"[RAG_HANDLER] 检索到 {len(hits)} 条上下文。")
             except Exception as e2:
                 logger.error(f"[RAG_HANDLER] 调用 Weaviate 检索失败: {e2}")
-                return {"answer": "抱歉，连接向量数据库出错。", "sources": []}
+                return {"result": {"answer": "抱歉，连接向量数据库出错。", "sources": []}}
 
-        # 4. 构建 Prompt
-        prompt = self._build_prompt(user_input, contexts)
+        # 4. 抽取式直答：用原始检索结果判断（去重之前，次佳候选才能参与比较）
+        direct = self.extractive.match(user_input, hits)
+        if direct is not None:
+            logger.info(f"[RAG_HANDLER] 抽取式直答 (问题相似度 {direct['similarity']:.3f}，"
+                        f"次佳 {direct['runner_up']:.3f})，跳过生成。")
+            return {"result": {"answer": direct["answer"], "sources": self._sources([direct]),
+                               "mode": "extractive", "similarity": direct["similarity"]}}
 
-        # 5. 调用 LLM 生成答案
+        # 5. 筛选上下文；剩余预算不够生成时直接返回最相关的问答原文
+        hits = self.context_budget.select(hits)
+        if not deadline.has(DEADLINE_GENERATE_RESERVE):
+            return {"result": self._degraded(hits, f"剩余时间预算 {deadline.remaining():.1f}s 不足以生成")}
+
+        # 6. 构建 Prompt
+        contexts = [format_context(h) for h in hits]
+        return {
+            "prompt": self._build_prompt(user_input, contexts),
+            "sources": self._sources(hits),
+            "hits": hits,
+            "query_vector": query_vector,
+        }
+
+    def _pipeline(self, user_input: str, query_vector: Optional[List[float]], deadline: Deadline,
+                  priority: int = PRIORITY_INTERACTIVE):
+        """完整问答流程：_prepare + 调用 LLM 生成答案（生成调度被拒绝时抛出 GenerationRejected）"""
+        prepared = yield from self._prepare(user_input, query_vector, deadline)
+        if "result" in prepared:
+            return prepared["result"]
+
+        # 7. 调用 LLM 生成答案
         try:
-            answer = self.ollama_client.generate_response(prompt)
+            answer = yield ("generate", (prepared["prompt"], priority))
             logger.info("[RAG_HANDLER] Ollama 生成答案成功。")
+            sources = prepared["sources"]
+            self.answer_cache.store(user_input, prepared["query_vector"], answer, sources)
             return {
                 "answer": answer,
-                "sources": [ctx.split('\n')[0] for ctx in contexts]
+                "sources": sources
             }
+        except GenerationRejected:
+            raise
         except Exception as e:
             logger.error(f"[RAG_HANDLER] 调用 Ollama 生成模型失败: {e}")
+            if prepared["hits"]:
+                return self._degraded(prepared["hits"], "生成失败或超出时间预算")
             return {"answer": "抱歉，生成答案时出错。", "sources": []}
+
+    @staticmethod
+    def _stage_timeout(op: str, deadline: Deadline) -> Optional[float]:
+        """各步骤的超时：不限预算时为 None（使用各客户端原有的超时），否则不超过剩余预算"""
+        if deadline.unlimited:
+            return None
+        if op == "embed":
+            return deadline.timeout(DEADLINE_EMBED_TIMEOUT)
+        return deadline.timeout(deadline.remaining())
+
+    def _perform(self, op: str, arg, deadline: Deadline):
+        timeout = self._stage_timeout(op, deadline)
+        if op == "embed":
+            return self.ollama_client.get_embedding(arg, timeout=timeout)
+        if op == "count":
+            return get_knowledge_count(timeout)
+        if op == "retrieve":
+            query, query_text = arg
+            return retrieve_hits(query, RETRIEVAL_TOP_K, query_text, timeout)
+        if op == "generate":
+            prompt, priority = arg
+            return self.ollama_client.generate_response(prompt, system=RAG_SYSTEM_PROMPT, priority=priority,
+                                                        timeout=timeout)
+        raise ValueError(f"未知操作: {op}")
+
+    async def _perform_async(self, op: str, arg, deadline: Deadline):
+        timeout = self._stage_timeout(op, deadline)
+        if op == "embed":
+            return await self._get_async_client().get_embedding(arg, timeout=timeout)
+        if op == "count":
+            return await get_knowledge_count_async(timeout)
+        if op == "retrieve":
+            query, query_text = arg
+            return await retrieve_hits_async(query, RETRIEVAL_TOP_K, query_text, timeout)
+        if op == "generate":
+            prompt, priority = arg
+            return await self._get_async_client().generate_response(prompt, system=RAG_SYSTEM_PROMPT,
+                                                                    priority=priority, timeout=timeout)
+        raise ValueError(f"未知操作: {op}")
+
+    def _get_async_client(self) -> AsyncOllamaClient:
+        if self._async_client is None:
+            self._async_client = AsyncOllamaClient()
+        return self._async_client
+
+    def _run(self, flow, deadline: Deadline):
+        """同步驱动流程生成器，返回其最终结果"""
+        try:
+            step = next(flow)
+            while True:
+                try:
+                    result = self._perform(*step, deadline)
+                except Exception as e:
+                    step = flow.throw(e)
+                else:
+                    step = flow.send(result)
+        except StopIteration as done:
+            return done.value
+
+    @staticmethod
+    def _flight_key(user_input: str, priority: int) -> str:
+        return f"{priority}:{normalize_question(user_input)}"
+
+    def answer_question(self, user_input: str, query_vector: Optional[List[float]] = None,
+                        priority: int = PRIORITY_INTERACTIVE, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        主流程：检索 + 生成
+        query_vector: 意图识别阶段已计算的查询向量，传入时不再重复调用 Embedding 接口
+        priority: 生成调度优先级（交互式聊天 / 批量评测）；生成队列已满或排队超时抛出 GenerationRejected
+        deadline: 请求级时间预算（缺省按 REQUEST_DEADLINE 新建）；预算不足时结果带 degraded=True
+        同一问题的并发请求只计算一次，共享结果（共享的是最早到达的请求的计算，其预算最先到期）。
+        """
+        deadline = deadline or Deadline()
+        if not RAG_SINGLE_FLIGHT:
+            return self._run(self._pipeline(user_input, query_vector, deadline, priority), deadline)
+        result = self.in_flight.do(self._flight_key(user_input, priority),
+                                   lambda: self._run(self._pipeline(user_input, query_vector, deadline, priority),
+                                                     deadline))
+        return dict(result)
+
+    def stream_answer(self, user_input: str, query_vector: Optional[List[float]] = None,
+                      priority: int = PRIORITY_INTERACTIVE,
+                      deadline: Optional[Deadline] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        流式问答：依次产出 (事件, 数据)
+        - ("sources", {"sources"})：检索完成后、排队等待生成槽位之前立即产出
+        - ("token", {"text"})：LLM 每生成一段文本产出一次
+        - ("done", {"answer", "sources", "cached"})：完整答案
+        无需调用 LLM 的结果（问候、缓存命中、知识库为空等）以单个 token 事件整体产出。
+        生成调度拒绝时在 sources 事件之后抛出 GenerationRejected。
+        时间预算用完时停止生成，done 事件带 degraded=True；尚未生成任何文本（如排队期间预算用完）时
+        以单个 token 事件返回最相关的问答原文，done 事件的 sources 只含这一条。
+        抽取式直答时不调用 LLM，整段答案作为一个 token 事件产出，done 事件带 mode=extractive。
+        同一问题的并发请求共享同一条事件流，后加入的请求先收到已产出的事件。
+        """
+        deadline = deadline or Deadline()
+        if not RAG_SINGLE_FLIGHT:
+            return self._stream_answer(user_input, query_vector, priority, deadline)
+        return self.shared_streams.subscribe(self._flight_key(user_input, priority),
+                                             lambda: self._stream_answer(user_input, query_vector, priority, deadline))
+
+    def _stream_answer(self, user_input: str, query_vector: Optional[List[float]],
+                       priority: int, deadline: Deadline) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        prepared = self._run(self._prepare(user_input, query_vector, deadline), deadline)
+        if "result" in prepared:
+            yield from self._single_shot(prepared["result"])
+            return
+
+        sources = prepared["sources"]
+        yield "sources", {"sources": sources}
+        chunks = []
+        stream = self.ollama_client.generate_stream(prepared["prompt"], system=RAG_SYSTEM_PROMPT, priority=priority,
+                                                    timeout=self._stage_timeout("generate", deadline))
+        try:
+            for text in stream:
+                chunks.append(text)
+                yield "token", {"text": text}
+                if deadline.expired:
+                    logger.warning("[RAG_HANDLER] 时间预算用完，停止流式生成。")
+                    yield "done", {"answer": "".join(chunks), "sources": sources, "cached": False, "degraded": True}
+                    return
+        except GenerationRejected:
+            raise
+        except Exception as e:
+            logger.error(f"[RAG_HANDLER] 调用 Ollama 生成模型失败: {e}")
+            if not chunks:
+                if prepared["hits"]:
+                    # 排队超出预算或生成失败：sources 已发出，以 token + done 给出最相关的问答原文
+                    degraded = self._degraded(prepared["hits"], "生成失败或超出时间预算")
+                    yield "token", {"text": degraded["answer"]}
+                    yield "done", {"answer": degraded["answer"], "sources": degraded["sources"],
+                                   "cached": False, "degraded": True}
+                    return
+                chunks.append("抱歉，生成答案时出错。")
+                yield "token", {"text": chunks[0]}
+            yield "done", {"answer": "".join(chunks), "sources": [], "cached": False, "error": True}
+            return
+        finally:
+            # 提前结束（预算用完、订阅者全部断开）时立即关闭 Ollama 流并归还生成槽位
+            stream.close()
+
+        answer = "".join(chunks)
+        logger.info("[RAG_HANDLER] Ollama 流式生成答案完成。")
+        self.answer_cache.store(user_input, prepared["query_vector"], answer, sources)
+        yield "done", {"answer": answer, "sources": sources, "cached": False}
+
+    @staticmethod
+    def _single_shot(result: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """无需（或放弃）流式生成的结果：sources、整段 token、done 依次产出"""
+        sources = result.get("sources", [])
+        yield "sources", {"sources": sources}
+        yield "token", {"text": result["answer"]}
+        done = {"answer": result["answer"], "sources": sources, "cached": bool(result.get("cached"))}
+        if result.get("degraded"):
+            done["degraded"] = True
+        if result.get("mode"):
+            done["mode"] = result["mode"]
+        yield "done", done
+
+    async def answer_question_async(self, user_input: str, query_vector: Optional[List[float]] = None,
+                                    priority: int = PRIORITY_INTERACTIVE,
+                                    deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """answer_question 的异步版本：向量化、检索与生成均以 await 方式调用，不阻塞事件循环"""
+        deadline = deadline or Deadline()
+        if not RAG_SINGLE_FLIGHT:
+            return await self._answer_async(user_input, query_vector, priority, deadline)
+        result = await self.in_flight.do_async(self._flight_key(user_input, priority),
+                                               lambda: self._answer_async(user_input, query_vector, priority, deadline))
+        return dict(result)
+
+    async def _answer_async(self, user_input: str, query_vector: Optional[List[float]],
+                            priority: int, deadline: Deadline) -> Dict[str, Any]:
+        flow = self._pipeline(user_input, query_vector, deadline, priority)
+        try:
+            step = next(flow)
+            while True:
+                try:
+                    result = await self._perform_async(*step, deadline)
+                except Exception as e:
+                    step = flow.throw(e)
+                else:
+                    step = flow.send(result)
+        except StopIteration as done:
+            return done.value
@@ -0,0 +1,72 @@
+# backend/rag/knowledge_state.py
+"""
+知识库记录数缓存
+
+RAG 每次问答前都要确认知识库非空，而记录数一天只变化一次。这里缓存最近一次的 Aggregate 计数：
+- 有效期内直接返回缓存值，热路径不访问 Weaviate
+- 过期后仍先返回旧值，同时在后台线程刷新（同一时刻只有一个刷新）
+- 知识库版本标记变化（导入脚本写入知识）时立即失效，下次调用重新计数
+只缓存大于 0 的计数：0 既可能是真的为空，也可能是 Weaviate 暂时不可用，不应被缓存下来。
+"""
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from config.settings import KNOWLEDGE_COUNT_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeCountCache:
+    def __init__(
+        self,
+        loader: Callable[[], int],
+        ttl: float = KNOWLEDGE_COUNT_TTL,
+        version_source: Optional[Callable[[], str]] = None,
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self._version_source = version_source
+        self._version = version_source() if version_source else ""
+        self._count: Optional[int] = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def peek(self) -> Optional[int]:
+        """返回缓存的计数；没有可用缓存时返回 None，由调用方自行计数后 set"""
+        with self._lock:
+            if self._version_source is not None:
+                version = self._version_source()
+                if version != self._version:
+                    self._version = version
+                    self._count = None
+            if self._count is None:
+                return None
+            if self.ttl > 0 and time.monotonic() - self._loaded_at > self.ttl and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name="kb-count-refresh", daemon=True).start()
+            return self._count
+
+    def set(self, count: int) -> None:
+        with self._lock:
+            if count > 0:
+                self._count = count
+                self._loaded_at = time.monotonic()
+            else:
+                self._count = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._count = None
+
+    def _refresh(self) -> None:
+        try:
+            count = self._loader()
+            self.set(count)
+        except Exception as e:
+            logger.warning(f"[KB_STATE] 后台刷新知识库计数失败: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
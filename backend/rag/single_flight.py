@@ -0,0 +1,228 @@
+# backend/rag/single_flight.py
+"""
+相同问题的并发请求合并（single-flight）
+
+热门问题往往在同一时刻被很多人提问，每个请求各自向量化、检索、生成，LLM 调用数随并发线性增长。
+这里按规范化后的问题文本合并正在进行中的请求：第一个请求执行计算，其余相同请求等待并共享它的结果。
+- SingleFlight：同步（线程）与异步（asyncio）两种等待方式，异常同样共享给所有等待者；
+  异步方式下计算在独立的 Task 中进行，任何一个等待者（包括发起者）被取消都不影响其他等待者
+- SharedStreams：流式请求共享同一条事件流。生产者在后台线程中运行，后加入的订阅者先补发已产出的事件，
+  再跟随实时事件；某个订阅者中途断开不影响其他订阅者，全部订阅者都断开后生产者停止（释放生成槽位）。
+只合并进行中的请求，计算结束即移除，不缓存结果（结果缓存由 SemanticAnswerCache 负责）。
+"""
+import asyncio
+import logging
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r'\s+')
+_TRAILING_PUNCT = re.compile(r'[\s?？!！。.,，~～]+$')
+
+
+def normalize_question(text: str) -> str:
+    """合并键：去掉首尾空白与句末标点、折叠连续空白、英文转小写"""
+    text = _SPACES.sub(" ", (text or "").strip().lower())
+    return _TRAILING_PUNCT.sub("", text)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[int, str], asyncio.Future] = {}  # 进行中的计算 Task
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """同一 key 同时只执行一次 fn，并发的调用方阻塞等待并得到同一结果（或同一异常）"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.followers += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            logger.info(f"[SINGLE_FLIGHT] 合并相同问题的并发请求: {key[:30]}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        do 的异步版本：计算作为独立的 Task 运行，同一事件循环内的相同请求（包括发起者自己）都 await 它。
+        shield：某个等待者被取消只取消它自己的等待，不取消共享的计算，也不会把取消传给其他等待者。
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        task = self._async_calls.get(loop_key)
+        if task is not None:
+            self.followers += 1
+            logger.info(f"[SINGLE_FLIGHT] 合并相同问题的并发请求: {key[:30]}")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._async_calls[loop_key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda done: self._async_done(loop_key, done))
+        return await asyncio.shield(task)
+
+    def _async_done(self, loop_key: Tuple[int, str], task: asyncio.Future) -> None:
+        if self._async_calls.get(loop_key) is task:
+            del self._async_calls[loop_key]
+        # 所有等待者都已离开时避免 "Task exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self._calls) + len(self._async_calls)}
+
+
+class _Broadcast:
+    """一条进行中的事件流：生产者追加事件，订阅者按各自的进度读取"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        self.abandoned = False      # 全部订阅者都已离开，生产者应停止
+        self.cond = threading.Condition()
+
+    def join(self) -> Optional["_Subscription"]:
+        """加入为订阅者；流已被放弃时返回 None（调用方应发起新的一轮）"""
+        with self.cond:
+            if self.abandoned:
+                return None
+            self.subscribers += 1
+        return _Subscription(self)
+
+    def leave(self) -> None:
+        with self.cond:
+            self.subscribers -= 1
+            if self.subscribers <= 0 and not self.finished:
+                self.abandoned = True
+                self.cond.notify_all()
+
+    def read(self) -> Iterator[Any]:
+        position = 0
+        while True:
+            with self.cond:
+                while position >= len(self.events) and not self.finished:
+                    self.cond.wait()
+                pending = self.events[position:]
+                finished = self.finished
+            for event in pending:
+                yield event
+            position += len(pending)
+            if finished and position >= len(self.events):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class _Subscription:
+    """
+    一个订阅者的迭代器：迭代结束、出错、被 close（如客户端断开）或被回收时离开事件流。
+    用类而不是生成器，是为了让尚未开始迭代就被丢弃的订阅者也能正确离开。
+    """
+
+    def __init__(self, stream: _Broadcast):
+        self._stream = stream
+        self._events = stream.read()
+        self._closed = False
+
+    def __iter__(self) -> "_Subscription":
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._events.close()
+            self._stream.leave()
+
+    def __del__(self):
+        self.close()
+
+
+class SharedStreams:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def subscribe(self, key: str, source: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """
+        返回 key 对应事件流的迭代器；没有进行中的流时用 source() 创建一条并在后台线程中生产。
+        source 抛出的异常在补发完已产出的事件后，由每个订阅者的迭代器各自抛出。
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            subscription = stream.join() if stream is not None else None
+            if subscription is not None:
+                self.followers += 1
+                logger.info(f"[SINGLE_FLIGHT] 加入进行中的流式回答: {key[:30]}")
+                return subscription
+            stream = self._streams[key] = _Broadcast()
+            subscription = stream.join()
+            self.leaders += 1
+
+        def _produce():
+            events = source()
+            try:
+                for event in events:
+                    if stream.abandoned:
+                        logger.info(f"[SINGLE_FLIGHT] 订阅者均已断开，停止流式生产: {key[:30]}")
+                        break
+                    with stream.cond:
+                        stream.events.append(event)
+                        stream.cond.notify_all()
+            except Exception as e:
+                logger.error(f"[SINGLE_FLIGHT] 流式生产出错: {e}")
+                stream.error = e
+            finally:
+                # 关闭事件源：停止生成并立即归还生成槽位
+                events.close()
+                # 先移出进行中列表再标记结束：之后到达的相同请求会发起新的一轮
+                with self._lock:
+                    if self._streams.get(key) is stream:
+                        del self._streams[key]
+                with stream.cond:
+                    stream.finished = True
+                    stream.cond.notify_all()
+
+        threading.Thread(target=_produce, name="shared-stream", daemon=True).start()
+        return subscription
@@ -0,0 +1,52 @@
+# backend/runtime/deadline.py
+"""
+请求级时间预算
+
+各阶段原先各有固定超时（向量化 60 秒、生成 120 秒、检索 15 秒），加起来可能要等好几分钟。
+每个问答请求在入口创建一个 Deadline，沿意图识别、向量化、检索、生成逐级传递：
+- 每个阶段的超时取 min(该阶段原有的超时上限, 剩余预算)
+- 剩余预算不足时由调用方降级（跳过向量化改用 BM25 检索、不调用 LLM 而直接返回最相关的问答原文）
+预算 <= 0 表示不限制，各阶段按原有超时执行。
+"""
+import math
+import time
+
+from config.settings import REQUEST_DEADLINE
+
+# 超时下限：剩余预算几乎用完时仍给出一个极短的正数超时，由调用方的异常处理走降级分支
+_MIN_TIMEOUT = 0.05
+
+
+class DeadlineExceeded(TimeoutError):
+    """在剩余预算内未能完成（如排队等待生成槽位超过了剩余时间）"""
+
+
+class Deadline:
+    def __init__(self, budget: float = REQUEST_DEADLINE):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget if budget > 0 else math.inf
+
+    @property
+    def unlimited(self) -> bool:
+        return self.expires_at == math.inf
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def has(self, seconds: float) -> bool:
+        """剩余预算是否还够 seconds 秒"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: float) -> float:
+        """某个阶段可用的超时：不超过该阶段原有的上限 cap，也不超过剩余预算"""
+        if self.unlimited:
+            return cap
+        return max(_MIN_TIMEOUT, min(cap, self.remaining()))
@@ -0,0 +1,131 @@
+# backend/runtime/endpoints.py
+"""
+多地址服务的端点选择与熔断
+
+同一个服务可能有多个候选地址（如容器名 weaviate:8080 与本机 localhost:8080）。
+- 记住最近一次成功的地址，之后优先使用（粘性）
+- 某个地址连续失败达到阈值后熔断（open），在冷却时间内直接跳过，不再等待超时
+- 冷却结束后进入半开（half-open）状态，只放行一个探测请求：成功则恢复，失败则重新熔断
+- 所有地址都处于熔断状态时立即抛出 EndpointUnavailable
+"""
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class EndpointUnavailable(ConnectionError):
+    """所有候选地址均不可用（熔断中或全部请求失败）"""
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+
+
+class EndpointResolver:
+    def __init__(self, name: str, urls: Iterable[str], failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.urls: List[str] = list(dict.fromkeys(u for u in urls if u))
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._circuits: Dict[str, _Circuit] = {url: _Circuit() for url in self.urls}
+        self._preferred: Optional[str] = self.urls[0] if self.urls else None
+        self._lock = threading.Lock()
+
+    @property
+    def preferred(self) -> Optional[str]:
+        return self._preferred
+
+    def _acquire(self) -> List[str]:
+        """按优先级返回本次可以尝试的地址；半开地址只放行一个请求"""
+        now = time.monotonic()
+        ordered = [self._preferred] + [u for u in self.urls if u != self._preferred]
+        allowed = []
+        with self._lock:
+            for url in ordered:
+                circuit = self._circuits[url]
+                if circuit.state == CLOSED:
+                    allowed.append(url)
+                elif circuit.state == OPEN and now - circuit.opened_at >= self.reset_timeout:
+                    circuit.state = HALF_OPEN
+                    allowed.append(url)
+        return allowed
+
+    def record_success(self, url: str) -> None:
+        with self._lock:
+            circuit = self._circuits[url]
+            if circuit.state != CLOSED:
+                logger.info(f"[ENDPOINT] {self.name} 地址恢复: {url}")
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.last_error = None
+            if self._preferred != url:
+                logger.info(f"[ENDPOINT] {self.name} 切换到地址: {url}")
+                self._preferred = url
+
+    def record_failure(self, url: str, error: Exception) -> None:
+        with self._lock:
+            circuit = self._circuits[url]
+            circuit.failures += 1
+            circuit.last_error = str(error)
+            if circuit.state == HALF_OPEN or circuit.failures >= self.failure_threshold:
+                if circuit.state != OPEN:
+                    logger.warning(f"[ENDPOINT] {self.name} 地址熔断 {self.reset_timeout:.0f}s: {url} ({error})")
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+
+    def call(self, func: Callable[[str], T]) -> T:
+        """依次在可用地址上调用 func(base_url)，返回第一个成功的结果"""
+        candidates = self._acquire()
+        if not candidates:
+            raise EndpointUnavailable(f"{self.name} 所有地址均处于熔断状态")
+        last_error: Optional[Exception] = None
+        for url in candidates:
+            try:
+                result = func(url)
+            except Exception as e:
+                self.record_failure(url, e)
+                last_error = e
+                continue
+            self.record_success(url)
+            return result
+        raise EndpointUnavailable(f"{self.name} 所有地址请求失败: {last_error}") from last_error
+
+    async def call_async(self, func: Callable[[str], Awaitable[T]]) -> T:
+        """call 的异步版本"""
+        candidates = self._acquire()
+        if not candidates:
+            raise EndpointUnavailable(f"{self.name} 所有地址均处于熔断状态")
+        last_error: Optional[Exception] = None
+        for url in candidates:
+            try:
+                result = await func(url)
+            except Exception as e:
+                self.record_failure(url, e)
+                last_error = e
+                continue
+            self.record_success(url)
+            return result
+        raise EndpointUnavailable(f"{self.name} 所有地址请求失败: {last_error}") from last_error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "preferred": self._preferred,
+                "endpoints": {
+                    url: {"state": c.state, "failures": c.failures, "last_error": c.last_error}
+                    for url, c in self._circuits.items()
+                },
+            }
@@ -0,0 +1,118 @@
+# backend/runtime/health.py
+"""
+后台服务健康监测
+
+按固定间隔探测 Weaviate、Ollama、PostgreSQL，把结果（是否可用、延迟、检查时间、错误）缓存在内存中。
+请求热路径只读取缓存的状态，不再为每次调用额外发起就绪检查；/ 健康检查接口直接输出这份状态。
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config.settings import HEALTH_CHECK_INTERVAL, HEALTH_CHECK_TIMEOUT, OLLAMA_API_URL
+
+logger = logging.getLogger(__name__)
+
+
+def _probe_weaviate(timeout: float) -> dict:
+    from db.vector_repo import _http_is_ready, endpoint_state
+    if not _http_is_ready(timeout=timeout):
+        raise ConnectionError("Weaviate 未就绪")
+    return {"endpoint": endpoint_state()["preferred"]}
+
+
+def _probe_ollama(timeout: float) -> None:
+    from runtime.http import get_session
+    response = get_session("ollama").get(f"{OLLAMA_API_URL}/api/tags", timeout=(timeout, timeout))
+    response.raise_for_status()
+
+
+def _probe_postgres(timeout: float) -> None:
+    from db.sql_repo import ping_db
+    if not ping_db():
+        raise ConnectionError("数据库未初始化")
+
+
+class HealthMonitor:
+    """
+    每个服务对应一个探测函数：正常返回表示可用（可返回附加信息 dict），抛出异常表示不可用。
+    状态未知（尚未完成第一次检查）时 is_down 返回 False，调用方照常访问服务。
+    """
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self._probes: Dict[str, Callable[[float], Optional[dict]]] = {
+            "weaviate": _probe_weaviate,
+            "ollama": _probe_ollama,
+            "postgres": _probe_postgres,
+        }
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def check(self, name: str) -> dict:
+        """立即探测一个服务并更新缓存的状态"""
+        started = time.perf_counter()
+        details = None
+        try:
+            details = self._probes[name](self.timeout)
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+        status = {
+            "healthy": healthy,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "last_checked": time.time(),
+            "error": error,
+        }
+        if details:
+            status.update(details)
+        with self._lock:
+            previous = self._state.get(name)
+            self._state[name] = status
+        if previous is None or previous["healthy"] != healthy:
+            if healthy:
+                logger.info(f"[HEALTH] {name} 可用 ({status['latency_ms']} ms)")
+            else:
+                logger.warning(f"[HEALTH] {name} 不可用: {error}")
+        return status
+
+    def check_all(self) -> Dict[str, dict]:
+        return {name: self.check(name) for name in self._probes}
+
+    def is_down(self, name: str) -> bool:
+        """热路径使用：仅当最近一次检查明确失败时返回 True"""
+        status = self._state.get(name)
+        return status is not None and not status["healthy"]
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: dict(status) for name, status in self._state.items()}
+
+    def start(self) -> None:
+        """启动后台检查线程（重复调用无副作用）"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+
+        def _run():
+            while True:
+                try:
+                    self.check_all()
+                except Exception as e:
+                    logger.error(f"[HEALTH] 健康检查出错: {e}")
+                if self._stop_event.wait(self.interval):
+                    break
+
+        self._thread = threading.Thread(target=_run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+# 进程内唯一实例
+health_monitor = HealthMonitor()
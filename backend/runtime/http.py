@@ -0,0 +1,88 @@
+# backend/runtime/http.py
+"""
+共享 HTTP 连接池
+
+模块级 requests.get/post 每次调用都会新建 TCP 连接。这里为每个下游服务（ollama、weaviate）
+各维护一个 requests.Session，挂载固定大小的 HTTPAdapter 连接池并保持 keep-alive，供所有线程共用。
+urllib3 连接池本身是线程安全的；这些 Session 不使用 cookie 或认证等可变状态。
+
+异步路径使用 httpx.AsyncClient（可选依赖），按事件循环各维护一份。
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.settings import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_async_clients: Dict[str, Tuple[asyncio.AbstractEventLoop, Any]] = {}
+
+
+def _build_session(pool_connections: int, pool_maxsize: int, pool_block: bool) -> requests.Session:
+    session = requests.Session()
+    # 重试由各调用方（回退 URL 等）自行处理，这里不做自动重试
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=0,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session(name: str) -> requests.Session:
+    """按服务名返回进程内共享的 Session"""
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _build_session(HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK)
+                _sessions[name] = session
+    return session
+
+
+def get_async_client(name: str):
+    """
+    按服务名返回当前事件循环共享的 httpx.AsyncClient。
+    AsyncClient 绑定创建它的事件循环，循环变化（如测试中多次 asyncio.run）时重新创建。
+    """
+    import httpx  # 仅异步入口需要
+
+    loop = asyncio.get_running_loop()
+    cached = _async_clients.get(name)
+    if cached is not None and cached[0] is loop and not cached[1].is_closed:
+        return cached[1]
+    client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_MAXSIZE,
+            max_keepalive_connections=HTTP_POOL_MAXSIZE,
+        ),
+        headers={"Connection": "keep-alive"},
+    )
+    _async_clients[name] = (loop, client)
+    return client
+
+
+async def close_async_clients() -> None:
+    """关闭当前事件循环上的异步连接池（async_app 关闭时调用）"""
+    loop = asyncio.get_running_loop()
+    for name, (client_loop, client) in list(_async_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            del _async_clients[name]
+
+
+def close_sessions() -> None:
+    """关闭所有连接池（进程退出或测试时使用）"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,158 @@
+# backend/runtime/models.py
+"""
+Ollama 模型预热与驻留监测
+
+部署后第一个请求、或模型空闲被 Ollama 卸载后的请求，要先等生成模型与向量模型从磁盘加载（10~30 秒）。
+这里在后台线程中：
+- 启动时对两个模型各发一次最小请求（1 个 token 的生成、一条短文本的向量化），并带上 keep_alive 使其常驻
+  生成模型的预热请求使用 RAG 的固定系统提示词，顺带把这段前缀的 KV 缓存准备好
+  生成预热与线上请求共用生成槽位（按批量优先级排队），不会越过 GENERATION_CONCURRENCY 挤占 Ollama 的并行度
+- 之后按固定间隔查询 /api/ps，发现模型已被卸载时立即重新预热，并记录每次加载的耗时
+/ 健康检查接口输出每个模型的驻留状态与最近一次加载耗时。
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from config.settings import (
+    OLLAMA_API_URL, LLM_MODEL_NAME, EMBEDDING_MODEL_NAME, OLLAMA_KEEP_ALIVE,
+    OLLAMA_CONNECT_TIMEOUT, OLLAMA_GENERATE_TIMEOUT, HEALTH_CHECK_TIMEOUT,
+    MODEL_WARMUP_ENABLED, MODEL_RESIDENCY_INTERVAL,
+)
+from runtime.http import get_session
+from llm.generation_scheduler import generation_scheduler, PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+def _full_name(model: str) -> str:
+    """/api/ps 返回带标签的模型名，未写标签的按 latest 处理"""
+    return model if ":" in model else f"{model}:latest"
+
+
+def _warm_generate(model: str) -> dict:
+    from rag.handler import RAG_SYSTEM_PROMPT
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": RAG_SYSTEM_PROMPT},
+            {"role": "user", "content": "你好"},
+        ],
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {"num_predict": 1},
+    }
+    with generation_scheduler.slot(PRIORITY_BATCH, measure=False):
+        response = get_session("ollama").post(f"{OLLAMA_API_URL}/api/chat", json=payload,
+                                              timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_GENERATE_TIMEOUT))
+    response.raise_for_status()
+    return response.json()
+
+
+def _warm_embed(model: str) -> dict:
+    payload = {"model": model, "prompt": "预热", "keep_alive": OLLAMA_KEEP_ALIVE}
+    response = get_session("ollama").post(f"{OLLAMA_API_URL}/api/embeddings", json=payload,
+                                          timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_GENERATE_TIMEOUT))
+    response.raise_for_status()
+    return response.json()
+
+
+def _loaded_models() -> Dict[str, dict]:
+    response = get_session("ollama").get(f"{OLLAMA_API_URL}/api/ps",
+                                         timeout=(OLLAMA_CONNECT_TIMEOUT, HEALTH_CHECK_TIMEOUT))
+    response.raise_for_status()
+    return {_full_name(m.get("name") or m.get("model") or ""): m for m in response.json().get("models") or []}
+
+
+class ModelResidencyMonitor:
+    """每个模型对应一个预热函数；状态按模型名缓存，供健康检查输出"""
+
+    def __init__(self, interval: float = MODEL_RESIDENCY_INTERVAL, enabled: bool = MODEL_WARMUP_ENABLED):
+        self.interval = interval
+        self.enabled = enabled
+        self._warmers = {
+            LLM_MODEL_NAME: _warm_generate,
+            EMBEDDING_MODEL_NAME: _warm_embed,
+        }
+        self._state: Dict[str, dict] = {
+            model: {"resident": None, "loads": 0, "last_load_ms": None, "expires_at": None, "error": None}
+            for model in self._warmers
+        }
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def warm_up(self, model: str) -> dict:
+        """对一个模型发起最小请求，使其加载并常驻；返回并记录加载耗时"""
+        started = time.perf_counter()
+        try:
+            body = self._warmers[model](model)
+        except Exception as e:
+            logger.warning(f"[MODELS] {model} 预热失败: {e}")
+            return self._update(model, resident=False, error=str(e))
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        # load_duration 为 Ollama 报告的模型加载耗时（纳秒）；已常驻时接近 0
+        load_ms = round((body.get("load_duration") or 0) / 1e6, 1)
+        with self._lock:
+            loads = self._state[model]["loads"] + 1
+        logger.info(f"[MODELS] {model} 已预热：加载 {load_ms} ms，请求总耗时 {elapsed_ms} ms")
+        return self._update(model, resident=True, loads=loads, last_load_ms=load_ms,
+                            last_warmup_ms=elapsed_ms, last_loaded=time.time(), error=None)
+
+    def warm_up_all(self) -> None:
+        for model in self._warmers:
+            self.warm_up(model)
+
+    def check(self) -> None:
+        """查询当前驻留的模型，已被卸载的重新预热"""
+        try:
+            loaded = _loaded_models()
+        except Exception as e:
+            logger.warning(f"[MODELS] 查询驻留模型失败: {e}")
+            return
+        for model in self._warmers:
+            info = loaded.get(_full_name(model))
+            if info is None:
+                logger.warning(f"[MODELS] {model} 未驻留，重新预热")
+                self.warm_up(model)
+            else:
+                self._update(model, resident=True, expires_at=info.get("expires_at"), last_checked=time.time())
+
+    def _update(self, model: str, **fields) -> dict:
+        with self._lock:
+            self._state[model].update(fields)
+            return dict(self._state[model])
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {model: dict(state) for model, state in self._state.items()}
+
+    def start(self) -> None:
+        """启动后台线程：先预热全部模型，再按间隔检查驻留（重复调用无副作用）"""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+
+        def _run():
+            try:
+                self.warm_up_all()
+            except Exception as e:
+                logger.error(f"[MODELS] 模型预热出错: {e}")
+            if self.interval <= 0:
+                return
+            while not self._stop_event.wait(self.interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    logger.error(f"[MODELS] 驻留检查出错: {e}")
+
+        self._thread = threading.Thread(target=_run, name="model-residency", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+# 进程内唯一实例
+model_residency = ModelResidencyMonitor()
@@ -0,0 +1,105 @@
+# backend/runtime/registry.py
+"""
+进程级共享模块注册表
+
+IntentRecognizer 构建时会查询 PostgreSQL 并为每个任务提取关键词，RAGHandler 持有 Ollama 客户端。
+这里把它们各构建一次，供所有请求线程共享；任务目录变化时在锁外构建新实例，再原子替换引用。
+"""
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from db.sql_repo import get_all_tasks
+from rag.handler import RAGHandler
+from workflow.intent_recognizer import IntentRecognizer
+
+logger = logging.getLogger(__name__)
+
+
+def _catalog_fingerprint() -> Optional[str]:
+    """计算任务目录的指纹；数据库不可用时返回 None"""
+    try:
+        tasks = get_all_tasks()
+    except Exception as e:
+        logger.warning(f"[REGISTRY] 读取任务目录失败: {e}")
+        return None
+    digest = hashlib.sha1()
+    for task in sorted(tasks, key=lambda t: t['task_id']):
+        digest.update(f"{task['task_id']}\x1f{task['task_name']}\x1f{task['description'] or ''}\x1e".encode('utf-8'))
+    return f"{len(tasks)}:{digest.hexdigest()}"
+
+
+class ModuleRegistry:
+    """持有共享的 IntentRecognizer / RAGHandler，并负责热替换"""
+
+    def __init__(self):
+        self._swap_lock = threading.Lock()      # 保护引用替换
+        self._reload_lock = threading.Lock()    # 防止多个线程同时重建
+        self._intent_recognizer: Optional[IntentRecognizer] = None
+        self._rag_handler: Optional[RAGHandler] = None
+        self._catalog_fingerprint: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ---------- 读取（热路径，无锁） ----------
+    def get_intent_recognizer(self) -> IntentRecognizer:
+        recognizer = self._intent_recognizer
+        if recognizer is None:
+            recognizer = self.reload_intent_recognizer(force=True)["recognizer"]
+        return recognizer
+
+    def get_rag_handler(self) -> RAGHandler:
+        handler = self._rag_handler
+        if handler is None:
+            with self._swap_lock:
+                if self._rag_handler is None:
+                    self._rag_handler = RAGHandler()
+                handler = self._rag_handler
+        return handler
+
+    # ---------- 重建与替换 ----------
+    def reload_intent_recognizer(self, force: bool = False) -> dict:
+        """
+        重新加载任务目录。force=False 时仅在目录指纹变化时重建。
+        返回 {"reloaded": bool, "task_count": int, "recognizer": IntentRecognizer}
+        """
+        with self._reload_lock:
+            fingerprint = _catalog_fingerprint()
+            current = self._intent_recognizer
+            if (not force and current is not None
+                    and (fingerprint is None or fingerprint == self._catalog_fingerprint)):
+                return {"reloaded": False, "task_count": len(current.task_data), "recognizer": current}
+
+            # 在锁外完成耗时的构建，只有引用替换在 _swap_lock 内
+            recognizer = IntentRecognizer()
+            with self._swap_lock:
+                self._intent_recognizer = recognizer
+                self._catalog_fingerprint = fingerprint
+            logger.info(f"[REGISTRY] IntentRecognizer 已替换, 共 {len(recognizer.task_data)} 个任务")
+            return {"reloaded": True, "task_count": len(recognizer.task_data), "recognizer": recognizer}
+
+    # ---------- 后台目录监视 ----------
+    def start_catalog_watcher(self, interval: float) -> None:
+        """按固定间隔比较任务目录指纹，有变化时自动重建"""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def _watch():
+            while not self._stop_event.wait(interval):
+                try:
+                    result = self.reload_intent_recognizer()
+                    if result["reloaded"]:
+                        logger.info("[REGISTRY] 检测到任务目录变化，已自动刷新")
+                except Exception as e:
+                    logger.error(f"[REGISTRY] 任务目录刷新失败: {e}")
+
+        self._watcher = threading.Thread(target=_watch, name="task-catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+# 进程内唯一实例
+registry = ModuleRegistry()
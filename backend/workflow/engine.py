@@ -41,3 +41,71 @@ class WorkflowEngine:
             logger.error(f"[WORKFLOW] Error retrieving available tasks: {e}")
             return []
 
+
+    @staticmethod
+    def _basic_steps(steps: list) -> list:
+        """意图识别器中的步骤名称列表 -> 前端步骤结构"""
+        detailed_steps = []
+        for i, step in enumerate(steps):
+            name = step if isinstance(step, str) else str(step)
+            detailed_steps.append({
+                'step_number': i + 1,
+                'step_name': name,
+                'description': name,
+                'element_id': '',
+                'action': 'click',
+                'image_path': None
+            })
+        return detailed_steps
+
+    def build_task_guidance(self, task_id: str, task_data: dict) -> dict:
+        """
+        构建 /chat 任务引导响应的 data 部分：
+        优先使用数据库中的详细步骤（含截图路径），否则退回意图识别器中的步骤名称。
+        """
+        task_name = task_data.get('name', '未知任务')
+        steps = task_data.get('steps', [])
+
+        detailed_steps = []
+        try:
+            task_details = get_task_details(task_id)
+            if task_details and 'steps' in task_details and task_details['steps']:
+                db_steps = task_details['steps']
+                logger.info(f"[WORKFLOW] 从数据库获取到 {len(db_steps)} 个步骤")
+                for i, db_step in enumerate(db_steps):
+                    element_id = db_step.get('element_id', '')
+                    detailed_steps.append({
+                        'step_number': db_step.get('step', i + 1),
+                        'step_name': db_step.get('step_name', f'步骤 {i + 1}'),
+                        'description': db_step.get('step_name', f'步骤 {i + 1}'),
+                        'element_id': element_id,
+                        'action': db_step.get('action', 'click'),
+                        'image_path': f"/images/{element_id}.png" if element_id else None
+                    })
+            else:
+                logger.info(f"[WORKFLOW] 数据库中无详细步骤，使用意图识别器中的 {len(steps)} 个步骤")
+                detailed_steps = self._basic_steps(steps)
+        except Exception as e:
+            logger.error(f"[WORKFLOW] 获取步骤详情时出错: {e}")
+            detailed_steps = self._basic_steps(steps)
+
+        # 生成富文本响应
+        if detailed_steps:
+            steps_text = []
+            for step_info in detailed_steps:
+                step_desc = f"{step_info['step_number']}. {step_info.get('step_name', step_info['description'])}"
+                if step_info.get('action') == 'click':
+                    step_desc += " (点击操作)"
+                elif step_info.get('action') == 'input':
+                    step_desc += " (输入操作)"
+                steps_text.append(step_desc)
+            response_text = f"我来帮你完成「{task_name}」任务。\n\n操作步骤：\n" + "\n".join(steps_text)
+        else:
+            response_text = f"我找到了「{task_name}」任务，但暂时没有详细步骤信息。"
+
+        return {
+            'task_name': task_name,
+            'description': task_data.get('description', ''),
+            'steps': detailed_steps,
+            'response_text': response_text
+        }
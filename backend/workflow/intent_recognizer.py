@@ -1,11 +1,33 @@
 from llm.ollama_client import OllamaClient  # 从 llm 目录导入 Ollama 客户端
-from config.settings import INTENT_CONFIDENCE_THRESHOLD  # 从 config 目录导入配置
+from config.settings import (  # 从 config 目录导入配置
+    INTENT_CONFIDENCE_THRESHOLD, EMBEDDING_MODEL_NAME, INTENT_SEMANTIC_ENABLED,
+    INTENT_SEMANTIC_THRESHOLD, INTENT_SEMANTIC_TOP_K, INTENT_EMBEDDINGS_PATH,
+    DEADLINE_EMBED_TIMEOUT,
+)
+from runtime.deadline import Deadline
+from typing import Optional
 from db.sql_repo import get_all_tasks  # 从数据库获取任务数据
+from workflow.keyword_matcher import KeywordAutomaton, SubstringIndex
+from workflow.semantic_index import TaskVectorIndex
+from workflow.scoring import BM25Index, calibrate_confidence
+from bisect import bisect_right
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
+# 低于该置信度时不再返回具体任务，直接视为通用问答
+MIN_TASK_CONFIDENCE = 0.20
+# 打分匹配的置信度上限，低于名称直接匹配（0.85~0.95）
+MAX_SCORED_CONFIDENCE = 0.90
+# 拼接检索文本时使用的分隔符，清理后的文本中不会出现
+_HAYSTACK_SEP = "\x00"
+
+
+def _clean_text(text: str) -> str:
+    """去掉空格和中文标点，用于名称/描述的直接匹配"""
+    return text.replace(" ", "").replace("，", "").replace("。", "")
+
 
 class IntentRecognizer:
     def __init__(self):
@@ -16,6 +38,12 @@ class IntentRecognizer:
         self.task_data = {}
         self.task_keywords = {}
         self._load_tasks_from_database()
+        self._build_match_index()
+        
+        # 可选的语义匹配：任务向量在加载时一次性计算（或从持久化文件读取）
+        self._semantic_index = None
+        if INTENT_SEMANTIC_ENABLED:
+            self._build_semantic_index()
         
         logger.info(f"[INTENT] Intent Recognizer initialized with {len(self.task_data)} tasks")
 
@@ -171,7 +199,145 @@ class IntentRecognizer:
         
         return list(set(keywords))
 
-    def recognize(self, user_input: str) -> dict:
+    def _build_match_index(self):
+        """
+        预先构建匹配索引，使 recognize 对用户输入只需扫描一遍：
+        - 名称/描述的清理文本 -> Aho-Corasick 自动机（判断任务名称是否包含在用户输入中）
+        - 名称/描述以分隔符拼接 -> 后缀自动机（判断用户输入是否包含在任务名称中，并找出第一次出现的位置）
+        - 名称/描述/步骤/关键词 -> BM25 倒排索引（模糊匹配打分）
+        """
+        self._task_order = list(self.task_data.keys())
+        self._exact_names = {}
+        self._direct_automaton = KeywordAutomaton()
+        bm25_docs = []
+
+        name_parts, name_offsets, name_tasks = [], [], []
+        desc_parts, desc_offsets, desc_tasks = [], [], []
+        name_pos = desc_pos = 0
+
+        for idx, task_id in enumerate(self._task_order):
+            task_info = self.task_data[task_id]
+            name_clean = _clean_text(task_info['name'])
+            desc_clean = _clean_text(task_info['description']) if task_info['description'] else ""
+
+            if name_clean:
+                self._exact_names.setdefault(name_clean, idx)
+                self._direct_automaton.add(name_clean, ('name', idx))
+                name_parts.append(name_clean)
+                name_offsets.append(name_pos)
+                name_tasks.append(idx)
+                name_pos += len(name_clean) + 1
+            if desc_clean:
+                self._direct_automaton.add(desc_clean, ('desc', idx))
+                desc_parts.append(desc_clean)
+                desc_offsets.append(desc_pos)
+                desc_tasks.append(idx)
+                desc_pos += len(desc_clean) + 1
+
+            bm25_docs.append({
+                'name': task_info['name'],
+                'description': task_info['description'],
+                'steps': task_info.get('steps', []),
+                'keywords': self.task_keywords.get(task_id, []),
+            })
+
+        self._name_index = SubstringIndex(_HAYSTACK_SEP.join(name_parts))
+        self._name_offsets = name_offsets
+        self._name_tasks = name_tasks
+        self._desc_index = SubstringIndex(_HAYSTACK_SEP.join(desc_parts))
+        self._desc_offsets = desc_offsets
+        self._desc_tasks = desc_tasks
+
+        self._direct_automaton.build()
+        self._bm25 = BM25Index.build(bm25_docs)
+
+    def _build_semantic_index(self):
+        """用 bge-m3 向量化每个任务的 full_text，构建任务向量矩阵"""
+        try:
+            texts = {task_id: self.task_data[task_id]['full_text'] for task_id in self._task_order}
+            self._semantic_index = TaskVectorIndex.build(
+                texts, self.ollama_client.get_embedding, EMBEDDING_MODEL_NAME, INTENT_EMBEDDINGS_PATH
+            )
+        except Exception as e:
+            logger.error(f"[INTENT] 构建语义索引失败，仅使用关键词匹配: {e}")
+            self._semantic_index = None
+
+    def _match_semantic(self, user_input: str, result: dict, deadline: Optional[Deadline] = None) -> dict:
+        """
+        关键词置信度不足时的语义匹配。无论是否命中，都把查询向量放入结果的 query_vector，
+        供随后的 RAG 检索复用，避免同一句话向量化两次。
+        deadline: 请求级时间预算，向量化的超时不超过其剩余时间
+        """
+        timeout = None
+        if deadline is not None and not deadline.unlimited:
+            timeout = deadline.timeout(DEADLINE_EMBED_TIMEOUT)
+        try:
+            query_vector = self.ollama_client.get_embedding(user_input, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"[INTENT] 查询向量化失败，跳过语义匹配: {e}")
+            return result
+
+        result = dict(result, query_vector=query_vector)
+        candidates = self._semantic_index.search(query_vector, INTENT_SEMANTIC_TOP_K)
+        if not candidates:
+            return result
+
+        task_id, similarity = candidates[0]
+        if similarity < INTENT_SEMANTIC_THRESHOLD:
+            logger.info(f"[INTENT] Semantic best {task_id} similarity {similarity:.3f} below threshold")
+            return result
+
+        # 相似度 [阈值, 1] 线性映射到置信度 [0.70, 0.90]，不超过名称直接匹配的置信度
+        span = max(1.0 - INTENT_SEMANTIC_THRESHOLD, 1e-6)
+        confidence = round(0.70 + 0.20 * min(1.0, (similarity - INTENT_SEMANTIC_THRESHOLD) / span), 2)
+        logger.info(f"[INTENT] Semantic match: {task_id} similarity {similarity:.3f} confidence {confidence:.2f}")
+        return dict(result, recognized_task_id=task_id, confidence=confidence)
+
+    def _match_direct(self, user_clean: str):
+        """
+        名称/描述直接匹配，规则优先级：名称完全相同(0.95) > 名称互相包含(0.90) > 描述互相包含(0.85)。
+        与逐个任务检查等价：取命中任务中顺序最靠前的一个，再按该任务满足的最高规则给出置信度。
+        返回 (task_id, confidence, kind) 或 None
+        """
+        # 输入中的分隔符会让匹配跨越两个任务的文本，先去掉
+        user_clean = user_clean.replace(_HAYSTACK_SEP, "")
+        if not user_clean:
+            return None
+
+        best = {}  # rule -> 命中该规则的最小任务序号
+
+        exact_idx = self._exact_names.get(user_clean)
+        if exact_idx is not None:
+            best['exact'] = exact_idx
+
+        # 任务名称/描述包含在用户输入中
+        for kind, idx in (p for pats in self._direct_automaton.search(user_clean).values() for p in pats):
+            if idx < best.get(kind, len(self._task_order)):
+                best[kind] = idx
+
+        # 用户输入包含在任务名称/描述中：拼接串中第一次出现的位置即对应顺序最靠前的任务
+        # （后缀自动机查找，代价只与输入长度有关）
+        for kind, index, offsets, tasks in (
+            ('name', self._name_index, self._name_offsets, self._name_tasks),
+            ('desc', self._desc_index, self._desc_offsets, self._desc_tasks),
+        ):
+            pos = index.find(user_clean)
+            if pos >= 0:
+                idx = tasks[bisect_right(offsets, pos) - 1]
+                if idx < best.get(kind, len(self._task_order)):
+                    best[kind] = idx
+
+        if not best:
+            return None
+        first = min(best.values())
+        for kind, confidence, label in (('exact', 0.95, 'Exact name'),
+                                        ('name', 0.90, 'Direct name'),
+                                        ('desc', 0.85, 'Description')):
+            if best.get(kind) == first:
+                return self._task_order[first], confidence, label
+        return None
+
+    def recognize(self, user_input: str, deadline: Optional[Deadline] = None) -> dict:
         """根据用户输入判断意图"""
         logger.info(f"[INTENT] Recognizing input: {user_input}")
 
@@ -179,128 +345,51 @@ class IntentRecognizer:
         if any(g in ui_lower for g in ["你好", "您好", "hi", "hello", "hey", "嗨", "在吗"]):
             return {"recognized_task_id": "greeting", "confidence": 1.0}
         
-        best_match = None
-        best_score = 0.0
-        
-        user_input_lower = user_input.lower()
-        user_input_clean = user_input.replace(" ", "").replace("，", "").replace("。", "")
-        
-        # 1. 首先尝试任务名称的精确匹配
-        for task_id, task_info in self.task_data.items():
-            task_name = task_info['name']
-            task_description = task_info['description']
-            
-            # 清理文本用于匹配
-            task_name_clean = task_name.replace(" ", "").replace("，", "").replace("。", "")
-            user_clean = user_input_clean.replace(" ", "").replace("，", "").replace("。", "")
-            
-            # 1.1 完全匹配或高度相似匹配
-            if task_name_clean == user_clean:
-                confidence = 0.95
-                logger.info(f"[INTENT] Exact name match: {task_id} with confidence {confidence:.2f}")
-                return {
-                    "recognized_task_id": task_id,
-                    "confidence": confidence
-                }
-            
-            # 1.2 任务名称包含用户输入或用户输入包含任务名称
-            if task_name_clean in user_clean or user_clean in task_name_clean:
-                confidence = 0.90
-                logger.info(f"[INTENT] Direct name match: {task_id} with confidence {confidence:.2f}")
-                return {
-                    "recognized_task_id": task_id,
-                    "confidence": confidence
-                }
-            
-            # 1.3 检查描述中的匹配
-            if task_description:
-                desc_clean = task_description.replace(" ", "").replace("，", "").replace("。", "")
-                if user_clean in desc_clean or desc_clean in user_clean:
-                    confidence = 0.85
-                    logger.info(f"[INTENT] Description match: {task_id} with confidence {confidence:.2f}")
-                    return {
-                        "recognized_task_id": task_id,
-                        "confidence": confidence
-                    }
-            
-            # 1.4 计算任务名称中关键词的匹配度
-            task_words = re.findall(r'[\u4e00-\u9fff]+', task_name)
-            matched_words = 0
-            total_word_score = 0
-            
-            for word in task_words:
-                if len(word) >= 2 and word in user_input:
-                    matched_words += 1
-                    # 根据词语重要性给予不同权重
-                    if word in ['添加', '分析', '信号', '处理', '频谱', 'FFT']:
-                        total_word_score += 0.4  # 重要词汇高权重
-                    else:
-                        total_word_score += 0.2  # 普通词汇低权重
-            
-            if len(task_words) > 0:
-                # 综合考虑匹配词数和词汇重要性
-                coverage_score = matched_words / len(task_words)
-                name_match_score = (coverage_score * 0.6 + total_word_score * 0.4) * 2.0
-                
-                if name_match_score > best_score:
-                    best_score = name_match_score
-                    best_match = task_id
-        
-        # 2. 如果没有直接匹配，使用关键词匹配
-        if best_score < 1.0:  # 如果任务名称匹配度不高，尝试关键词匹配
-            for task_id, keywords in self.task_keywords.items():
-                score = 0.0
-                matched_keywords = 0
-                
-                for keyword in keywords:
-                    if len(keyword) >= 2 and keyword.lower() in user_input_lower:
-                        matched_keywords += 1
-                        # 根据关键词长度和重要性给予不同权重
-                        if len(keyword) >= 4:
-                            score += 0.3  # 长关键词权重高
-                        else:
-                            score += 0.1  # 短关键词权重低
-                
-                # 计算匹配度
-                if len(keywords) > 0:
-                    keyword_coverage = matched_keywords / len(keywords)
-                    final_score = score * keyword_coverage
-                    
-                    if final_score > best_score:
-                        best_score = final_score
-                        best_match = task_id
+        user_clean = _clean_text(user_input)
         
-        # 3. 根据匹配分数确定置信度
-        if best_match and best_score > 0.1:  # 进一步降低阈值以提高识别率
-            # 动态计算置信度
-            if best_score >= 1.5:
-                confidence = 0.90
-            elif best_score >= 1.0:
-                confidence = 0.85
-            elif best_score >= 0.6:
-                confidence = 0.80
-            elif best_score >= 0.4:
-                confidence = 0.75
-            else:
-                confidence = 0.70
-                
-            logger.info(f"[INTENT] Matched task {best_match} with score {best_score:.2f} and confidence {confidence:.2f}")
+        # 1. 首先尝试任务名称/描述的直接匹配（按任务顺序取第一个命中的任务）
+        direct = self._match_direct(user_clean)
+        if direct is not None:
+            task_id, confidence, kind = direct
+            logger.info(f"[INTENT] {kind} match: {task_id} with confidence {confidence:.2f}")
             return {
-                "recognized_task_id": best_match,
+                "recognized_task_id": task_id,
                 "confidence": confidence
             }
         
-        # 低置信度匹配 (触发 RAG 问答)
-        logger.info(f"[INTENT] No high-confidence match found (best score: {best_score:.2f}), routing to RAG")
-        return {
+        # 2. BM25 打分：一次稀疏计算得到所有任务的得分，再由得分分布校准置信度
+        top, upper = self._bm25.top(user_input, 2)
+        confidence = round(min(MAX_SCORED_CONFIDENCE, calibrate_confidence([score for _, score in top], upper)), 2)
+        
+        result = {
             "recognized_task_id": "generic_qa",
-            "confidence": 0.20
+            "confidence": MIN_TASK_CONFIDENCE
         }
+        if top and confidence > MIN_TASK_CONFIDENCE:
+            result = {
+                "recognized_task_id": self._task_order[top[0][0]],
+                "confidence": confidence
+            }
+            logger.info(f"[INTENT] BM25 matched task {result['recognized_task_id']} "
+                        f"with score {top[0][1]:.2f}/{upper:.2f} and confidence {confidence:.2f}")
+        
+        # 3. 关键词置信度不足时尝试语义匹配，取置信度更高者
+        if result["confidence"] < INTENT_CONFIDENCE_THRESHOLD and self._semantic_index is not None:
+            semantic = self._match_semantic(user_input, result, deadline)
+            if semantic["confidence"] > result["confidence"]:
+                return semantic
+            result = dict(result, query_vector=semantic.get("query_vector"))
+        
+        if result["recognized_task_id"] == "generic_qa":
+            # 低置信度匹配 (触发 RAG 问答)
+            logger.info("[INTENT] No high-confidence match found, routing to RAG")
+        return result
 
-    def recognize_intent(self, user_input: str) -> dict:
+    def recognize_intent(self, user_input: str, deadline: Optional[Deadline] = None) -> dict:
         """意图识别方法 - 为了兼容app.py中的调用"""
-        result = self.recognize(user_input)
+        result = self.recognize(user_input, deadline)
         return {
             "task_id": result.get("recognized_task_id"),
-            "confidence": result.get("confidence", 0.0)
+            "confidence": result.get("confidence", 0.0),
+            "query_vector": result.get("query_vector")
         }
@@ -0,0 +1,151 @@
+# backend/workflow/keyword_matcher.py
+"""
+任务名称/描述的直接匹配
+
+- KeywordAutomaton：Aho-Corasick 多模式匹配自动机，判断哪些模式（任务名称等）包含在用户输入中
+- SubstringIndex：后缀自动机，判断用户输入是否包含在某段文本（拼接的任务名称等）中并给出首次出现的位置
+两者都一次性由任务目录构建，之后对用户输入只需扫描一遍，匹配代价与任务目录规模无关。
+"""
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Set
+
+
+class KeywordAutomaton:
+    """
+    用法：
+        automaton = KeywordAutomaton()
+        automaton.add("频谱分析", ("task_fft", "keyword"))
+        automaton.build()
+        automaton.search("如何做频谱分析")  # -> {"频谱分析": [("task_fft", "keyword")]}
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[str]] = [[]]
+        self._payloads: Dict[str, List[Hashable]] = {}
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def add(self, pattern: str, payload: Hashable) -> None:
+        """注册一个模式及其附带数据；同一模式可以对应多个 payload"""
+        if not pattern:
+            return
+        if self._built:
+            raise RuntimeError("KeywordAutomaton 已构建，不能再添加模式")
+
+        payloads = self._payloads.get(pattern)
+        if payloads is not None:
+            payloads.append(payload)
+            return
+        self._payloads[pattern] = [payload]
+
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = nxt
+        self._outputs[state].append(pattern)
+
+    def build(self) -> "KeywordAutomaton":
+        """按 BFS 计算失败指针，并把后缀状态的输出合并到当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._outputs[nxt] = self._outputs[nxt] + self._outputs[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter_patterns(self, text: str) -> Iterable[str]:
+        """扫描文本，按出现顺序产出命中的模式（同一模式可能多次出现）"""
+        if not self._built:
+            self.build()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                yield from outputs[state]
+
+    def matched_patterns(self, text: str) -> Set[str]:
+        """返回文本中出现过的所有不同模式"""
+        return set(self.iter_patterns(text))
+
+    def payloads(self, pattern: str) -> List[Hashable]:
+        """返回某个模式注册的全部 payload"""
+        return self._payloads.get(pattern, [])
+
+    def search(self, text: str) -> Dict[str, List[Hashable]]:
+        """返回 {命中的模式: [payload, ...]}"""
+        return {pattern: self._payloads[pattern] for pattern in self.matched_patterns(text)}
+
+
+class SubstringIndex:
+    """
+    文本的后缀自动机：find(pattern) 返回 pattern 在文本中第一次出现的位置（不存在为 -1），
+    代价 O(len(pattern))，与文本长度无关；构建代价 O(len(text))。
+    用法：
+        index = SubstringIndex("导入模型文件\x00删除模型文件")
+        index.find("模型")  # -> 2
+    """
+
+    def __init__(self, text: str):
+        self._next: List[Dict[str, int]] = [{}]
+        self._link: List[int] = [-1]
+        self._len: List[int] = [0]
+        self._first_end: List[int] = [-1]  # 该状态对应的子串第一次出现时的结束位置
+        last = 0
+        for pos, ch in enumerate(text):
+            last = self._extend(last, ch, pos)
+
+    def _new_state(self, length: int, link: int, first_end: int, transitions: Dict[str, int]) -> int:
+        self._next.append(transitions)
+        self._link.append(link)
+        self._len.append(length)
+        self._first_end.append(first_end)
+        return len(self._next) - 1
+
+    def _extend(self, last: int, ch: str, pos: int) -> int:
+        cur = self._new_state(self._len[last] + 1, 0, pos, {})
+        p = last
+        while p != -1 and ch not in self._next[p]:
+            self._next[p][ch] = cur
+            p = self._link[p]
+        if p != -1:
+            q = self._next[p][ch]
+            if self._len[p] + 1 == self._len[q]:
+                self._link[cur] = q
+            else:
+                clone = self._new_state(self._len[p] + 1, self._link[q], self._first_end[q], dict(self._next[q]))
+                while p != -1 and self._next[p].get(ch) == q:
+                    self._next[p][ch] = clone
+                    p = self._link[p]
+                self._link[q] = clone
+                self._link[cur] = clone
+        return cur
+
+    def find(self, pattern: str) -> int:
+        if not pattern:
+            return 0
+        state = 0
+        for ch in pattern:
+            state = self._next[state].get(ch)
+            if state is None:
+                return -1
+        return self._first_end[state] - len(pattern) + 1
@@ -0,0 +1,171 @@
+# backend/workflow/scoring.py
+"""
+BM25 意图打分引擎
+
+- 分词：中文按字符二元组（单字片段保留单字），英文/数字按连续串并转小写
+- 倒排索引：token -> (任务序号数组, 预计算的 BM25 权重数组)，多字段按权重合并（BM25F 简化版）
+- 查询：取出查询 token 的倒排表拼接后 np.unique + np.bincount 得到被触及任务的得分，argpartition 取前 k，
+  代价只与触及的倒排表长度有关
+- 置信度：由得分分布校准（最高分、与第二名的分差各占查询可达上限的比例，经逻辑回归映射为概率）
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_CJK_RUN = re.compile(r'[\u4e00-\u9fff]+')
+_WORD_RUN = re.compile(r'[a-z0-9]+')
+
+# 字段权重：任务名称最能代表意图，步骤名称中多为“点击”等通用动作
+DEFAULT_FIELD_WEIGHTS = {
+    'name': 2.0,
+    'description': 1.0,
+    'steps': 0.5,
+    'keywords': 0.5,
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """中文字符二元组 + 英文/数字词"""
+    text = (text or "").lower()
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(_WORD_RUN.findall(text))
+    return tokens
+
+
+class BM25Index:
+    """多字段 BM25 倒排索引，文档以插入顺序编号"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, field_weights: Optional[Dict[str, float]] = None):
+        self.k1 = k1
+        self.b = b
+        self.field_weights = field_weights or DEFAULT_FIELD_WEIGHTS
+        self.doc_count = 0
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._idf: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    @classmethod
+    def build(cls, docs: Sequence[Dict[str, Iterable[str]]], **kwargs) -> "BM25Index":
+        """
+        docs: 每个文档是 {字段名: 文本或文本列表}，字段名对应 field_weights
+        """
+        index = cls(**kwargs)
+        index._index(docs)
+        return index
+
+    def _index(self, docs: Sequence[Dict[str, Iterable[str]]]) -> None:
+        doc_tfs: List[Counter] = []
+        doc_lens = np.zeros(len(docs), dtype=np.float32)
+        for n, doc in enumerate(docs):
+            tf = Counter()
+            for field, weight in self.field_weights.items():
+                value = doc.get(field)
+                if not value:
+                    continue
+                texts = [value] if isinstance(value, str) else value
+                for text in texts:
+                    for token in tokenize(text):
+                        tf[token] += weight
+            doc_tfs.append(tf)
+            doc_lens[n] = sum(tf.values())
+
+        self.doc_count = len(docs)
+        avgdl = float(doc_lens.mean()) if self.doc_count and doc_lens.sum() > 0 else 1.0
+
+        raw: Dict[str, Tuple[List[int], List[float]]] = defaultdict(lambda: ([], []))
+        for n, tf in enumerate(doc_tfs):
+            for token, freq in tf.items():
+                raw[token][0].append(n)
+                raw[token][1].append(freq)
+
+        for token, (doc_ids, freqs) in raw.items():
+            df = len(doc_ids)
+            idf = math.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+            ids = np.asarray(doc_ids, dtype=np.int32)
+            tf_arr = np.asarray(freqs, dtype=np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lens[ids] / avgdl)
+            self._postings[token] = (ids, (idf * tf_arr * (self.k1 + 1.0) / (tf_arr + norm)).astype(np.float32))
+            self._idf[token] = idf
+
+    @property
+    def max_idf(self) -> float:
+        """未出现在任何文档中的 token 的 idf（df = 0），即 idf 的最大可能值"""
+        return math.log(1.0 + (self.doc_count + 0.5) / 0.5)
+
+    def _touched(self, query: str) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        返回 (被查询触及的文档序号（升序）, 对应得分, 本查询可达的得分上限)，代价只与触及的倒排表长度有关。
+        上限为查询中每个 token 的 idf * (k1 + 1) 之和，即 tf 趋于无穷时的 BM25 得分；
+        未被索引的 token 按最大 idf 计入，查询中与任何任务都无关的内容越多，最佳得分占上限的比例越低。
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        tokens = [t for t in query_tokens if t in self._postings]
+        if not tokens or not self.doc_count:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64), 0.0
+        ids = np.concatenate([self._postings[t][0] for t in tokens])
+        weights = np.concatenate([self._postings[t][1] for t in tokens])
+        doc_ids, inverse = np.unique(ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights, minlength=len(doc_ids))
+        max_idf = self.max_idf
+        upper = sum(self._idf.get(t, max_idf) for t in query_tokens) * (self.k1 + 1.0)
+        return doc_ids, scores, upper
+
+    def score(self, query: str) -> Tuple[np.ndarray, float]:
+        """返回 (所有文档的得分数组, 本查询可达的得分上限)"""
+        doc_ids, touched, upper = self._touched(query)
+        scores = np.zeros(self.doc_count, dtype=np.float64)
+        scores[doc_ids] = touched
+        return scores, upper
+
+    def top(self, query: str, k: int = 2) -> Tuple[List[Tuple[int, float]], float]:
+        """返回得分最高的 k 个 (文档序号, 得分) 以及得分上限；得分相同时序号小者优先"""
+        doc_ids, scores, upper = self._touched(query)
+        if upper <= 0 or k <= 0:
+            return [], upper
+        positive = scores > 0
+        doc_ids, scores = doc_ids[positive], scores[positive]
+        if len(scores) > k:
+            # 只在触及的文档中取前 k：argpartition 找到第 k 高的得分，与它同分的全部保留，
+            # 再对这一小部分稳定排序，保证同分时序号小者优先
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            keep = scores >= kth
+            doc_ids, scores = doc_ids[keep], scores[keep]
+        # doc_ids 升序，稳定排序保证同分时按文档顺序
+        order = np.argsort(-scores, kind='stable')[:k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order], upper
+
+
+# 置信度校准系数：由 calibrate_intent.py 在 data/intent_calibration.jsonl 上拟合的逻辑回归
+# （任务名称改写问法为正例，知识库问题为负例；任务目录或知识库变化后重新运行该脚本）
+_CALIBRATION_BIAS = -3.2
+_CALIBRATION_STRENGTH = 9.1
+_CALIBRATION_MARGIN = 23.2
+
+
+def calibrate_confidence(top_scores: Sequence[float], upper: float) -> float:
+    """
+    由得分分布估计“识别正确”的概率（0~1）：
+    - strength = s1 / upper：最佳任务解释了查询中多少信息量
+    - margin = (s1 - s2) / upper：最佳任务相对第二名的领先量占查询上限的比例；
+      按上限而不是按 s1 归一，只共享一两个 token 的唯一候选不会因“没有第二名”而得到满分领先
+    """
+    if not top_scores or upper <= 0:
+        return 0.0
+    s1 = top_scores[0]
+    if s1 <= 0:
+        return 0.0
+    s2 = top_scores[1] if len(top_scores) > 1 else 0.0
+    strength = min(1.0, s1 / upper)
+    margin = (s1 - s2) / upper
+    logit = _CALIBRATION_BIAS + _CALIBRATION_STRENGTH * strength + _CALIBRATION_MARGIN * margin
+    return 1.0 / (1.0 + math.exp(-logit))
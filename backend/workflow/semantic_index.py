@@ -0,0 +1,128 @@
+# backend/workflow/semantic_index.py
+"""
+任务向量索引
+
+每个任务的 full_text 只向量化一次，所有向量按行存放在一个连续的 float32 矩阵中（已 L2 归一化），
+查询时一次矩阵-向量乘法即可得到全部任务的余弦相似度。
+向量持久化为内存映射向量存储（db.embedding_store）：任务文本未变化时下次启动直接复用，
+且矩阵直接映射自文件，多个 worker 进程共享同一份页缓存。
+"""
+import hashlib
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db.embedding_store import EmbeddingStore, write_store
+
+logger = logging.getLogger(__name__)
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def normalize_vector(vector) -> np.ndarray:
+    """转换为 float32 并做 L2 归一化；零向量原样返回"""
+    vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
+
+
+class TaskVectorIndex:
+    """task_id -> 归一化向量 的只读矩阵索引"""
+
+    def __init__(self, task_ids: List[str], matrix: np.ndarray):
+        self.task_ids = task_ids
+        # np.memmap 已是连续的 float32，ascontiguousarray 不会复制
+        self.matrix = matrix if isinstance(matrix, np.memmap) else np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+    @classmethod
+    def build(
+        cls,
+        texts: Dict[str, str],
+        embed: Callable[[str], Sequence[float]],
+        model: str,
+        path: Optional[str] = None,
+    ) -> "TaskVectorIndex":
+        """
+        为 {task_id: text} 构建索引。path 指定的持久化文件中同模型、同文本的向量直接复用，
+        只有新增或修改过的任务才会调用 embed。
+        """
+        store = cls._open_store(path, model) if path else None
+
+        task_ids, rows, embedded = [], [], 0
+        for task_id, text in texts.items():
+            vector = cls._cached_vector(store, task_id, text)
+            if vector is None:
+                try:
+                    vector = normalize_vector(embed(text))
+                    embedded += 1
+                except Exception as e:
+                    logger.warning(f"[SEMANTIC] 任务 {task_id} 向量化失败，跳过: {e}")
+                    continue
+            task_ids.append(task_id)
+            rows.append(vector)
+
+        if store is not None and not embedded and task_ids == store.ids:
+            # 全部命中且顺序一致：直接使用映射自文件的矩阵，不在本进程复制
+            index = cls(task_ids, store.matrix)
+        else:
+            if rows:
+                matrix = np.vstack(rows).astype(np.float32, copy=False)
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            index = cls(task_ids, matrix)
+            if path and rows:
+                index = index._save(path, model, texts)
+        logger.info(f"[SEMANTIC] 任务向量索引就绪: {len(task_ids)} 个任务, 新向量化 {embedded} 个")
+        return index
+
+    @staticmethod
+    def _open_store(path: str, model: str) -> Optional[EmbeddingStore]:
+        if not os.path.exists(path):
+            return None
+        try:
+            store = EmbeddingStore.open(path)
+        except Exception as e:
+            logger.warning(f"[SEMANTIC] 读取任务向量文件失败 {path}: {e}")
+            return None
+        if store.meta.get("model") != model:
+            logger.info(f"[SEMANTIC] 向量文件模型不一致 ({store.meta.get('model')} != {model})，重新向量化")
+            return None
+        return store
+
+    @staticmethod
+    def _cached_vector(store: Optional[EmbeddingStore], task_id: str, text: str) -> Optional[np.ndarray]:
+        if store is None:
+            return None
+        n = store.position(task_id)
+        if n is None or store.meta.get("text_hashes", [])[n] != _text_hash(text):
+            return None
+        return store.matrix[n]
+
+    def _save(self, path: str, model: str, texts: Dict[str, str]) -> "TaskVectorIndex":
+        """写入存储文件（先写临时文件再替换），并返回映射自新文件的索引"""
+        try:
+            write_store(path, self.task_ids, self.matrix, {
+                "model": model,
+                "text_hashes": [_text_hash(texts[t]) for t in self.task_ids],
+            })
+            return TaskVectorIndex(self.task_ids, EmbeddingStore.open(path).matrix)
+        except Exception as e:
+            logger.warning(f"[SEMANTIC] 保存任务向量文件失败 {path}: {e}")
+            return self
+
+    def search(self, query_vector, top_k: int = 3) -> List[Tuple[str, float]]:
+        """返回相似度最高的 top_k 个 (task_id, cosine)"""
+        if not self.task_ids:
+            return []
+        scores = self.matrix @ normalize_vector(query_vector)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.task_ids[i], float(scores[i])) for i in top]
@@ -81,7 +81,7 @@ const ChatInterface = () => {
     }
   ]);
   const [input, setInput] = useState('');
-  const { loading, error, request } = useApi();
+  const { loading, error, stream } = useApi();
   const messagesEndRef = useRef(null);
   const backendUrl = process.env.REACT_APP_BACKEND_URL || '/api';
 
@@ -104,60 +104,47 @@ const ChatInterface = () => {
       timestamp: new Date()
     };
 
-    setMessages(prev => [...prev, userMessage]);
+    // 助手消息先以空内容占位（渲染时隐藏，显示“正在思考”），之后各事件只按 id 更新它
+    const assistantId = Date.now() + 1;
+    setMessages(prev => [...prev, userMessage, {
+      id: assistantId,
+      type: 'assistant',
+      responseType: 'open_qa',
+      content: '',
+      timestamp: new Date()
+    }]);
     setInput('');
 
+    const updateAssistant = (patch) => {
+      setMessages(prev => prev.map(m => (m.id === assistantId ? { ...m, ...patch(m) } : m)));
+    };
+
     try {
-      const response = await request({
-        url: '/chat',
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        data: { user_input: input.trim() }
+      // 流式接口：先收到路由结果与来源，再逐段收到答案文本
+      await stream('/chat/stream', { user_input: userMessage.content }, (event, data) => {
+        if (event === 'route') {
+          updateAssistant(() => ({ responseType: data.response_type }));
+        } else if (event === 'task') {
+          // 任务执行响应 - 结构化数据
+          updateAssistant(() => ({ responseType: 'task_execution', taskData: data }));
+        } else if (event === 'token') {
+          // RAG问答响应 - 增量追加文本
+          updateAssistant(m => ({ content: m.content + data.text }));
+        } else if (event === 'done') {
+          updateAssistant(m => ({
+            content: m.content || data.answer || '抱歉，我无法回答这个问题。',
+            sources: data.sources || []
+          }));
+        } else if (event === 'error') {
+          updateAssistant(m => ({
+            content: m.content || '抱歉，我现在无法处理你的请求。'
+          }));
+        }
       });
-
-      // 根据后端响应类型处理消息内容
-      let assistantMessage;
-      
-      if (response.response_type === 'task_execution') {
-        // 任务执行响应 - 结构化数据
-        assistantMessage = {
-          id: Date.now() + 1,
-          type: 'assistant',
-          responseType: 'task_execution',
-          taskData: response.data,
-          timestamp: new Date()
-        };
-      } else if (response.response_type === 'open_qa') {
-        // RAG问答响应 - 纯文本
-        assistantMessage = {
-          id: Date.now() + 1,
-          type: 'assistant',
-          responseType: 'open_qa',
-          content: response.data?.answer || response.data?.response || '抱歉，我无法回答这个问题。',
-          timestamp: new Date()
-        };
-      } else {
-        // 默认响应
-        assistantMessage = {
-          id: Date.now() + 1,
-          type: 'assistant',
-          responseType: 'default',
-          content: '抱歉，我现在无法处理你的请求。',
-          timestamp: new Date()
-        };
-      }
-
-      setMessages(prev => [...prev, assistantMessage]);
     } catch (err) {
-      const errorMessage = {
-        id: Date.now() + 1,
-        type: 'assistant',
-        content: '抱歉，发生了错误。请稍后再试。',
-        timestamp: new Date()
-      };
-      setMessages(prev => [...prev, errorMessage]);
+      updateAssistant(m => ({
+        content: m.content || '抱歉，发生了错误。请稍后再试。'
+      }));
     }
   };
 
@@ -175,7 +162,7 @@ const ChatInterface = () => {
       </div>
       
       <div className="chat-messages">
-        {messages.map((message) => (
+        {messages.filter(m => m.content !== '' || m.taskData).map((message) => (
           <div key={message.id} className={`message ${message.type}`}>
             <div className="message-content">
               {message.responseType === 'task_execution' ? (
@@ -189,7 +176,7 @@ const ChatInterface = () => {
             </div>
           </div>
         ))}
-        {loading && (
+        {loading && (messages[messages.length - 1]?.type === 'user' || messages[messages.length - 1]?.content === '') && (
           <div className="message assistant">
             <div className="message-content loading">
               <div className="typing-indicator">
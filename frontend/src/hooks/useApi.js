@@ -22,6 +22,53 @@ export const useApi = () => {
     }
   }, [axiosInstance]);
 
+  // 以 POST 发起 Server-Sent Events 请求，每收到一个事件调用 onEvent(event, data)
+  const stream = useCallback(async (url, body, onEvent) => {
+    try {
+      setLoading(true);
+      setError(null);
+      const response = await fetch(`${baseURL}${url}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+        body: JSON.stringify(body)
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`请求失败 (${response.status})`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder('utf-8');
+      let buffer = '';
+      const dispatch = (block) => {
+        let event = 'message';
+        const dataLines = [];
+        block.split('\n').forEach((line) => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+        });
+        if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+      };
+
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+          dispatch(buffer.slice(0, boundary));
+          buffer = buffer.slice(boundary + 2);
+          boundary = buffer.indexOf('\n\n');
+        }
+      }
+      if (buffer.trim()) dispatch(buffer);
+    } catch (err) {
+      setError(err.message || '请求失败');
+      throw err;
+    } finally {
+      setLoading(false);
+    }
+  }, [baseURL]);
+
   const clearError = useCallback(() => {
     setError(null);
   }, []);
@@ -30,6 +77,7 @@ export const useApi = () => {
     loading,
     error,
     request,
+    stream,
     clearError
   };
 };
\ No newline at end of file